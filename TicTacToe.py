@@ -1,12 +1,279 @@
 #!/Library/Frameworks/Python.framework/Versions/3.3/bin/python3
 # N-Dimensional Tic-Tac-Toe by Thomas Lively
 
-import curses, curses.ascii, sys
+import argparse, collections, copy, curses, curses.ascii, itertools, random, sys, threading
+
+# numpy is optional and only needed by NumpyModel and for batches given as numpy arrays.
+# It is imported on first use, so scripts that never need it start quickly
+numpy = None
+
+# imports numpy into this module and returns it, or returns None if it is not installed
+def importNumpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            return None
+        numpy = module
+    return numpy
+
+# returns whether value is a numpy array, without importing numpy for other values
+def isArray(value):
+    return "numpy" in sys.modules and isinstance(value, sys.modules["numpy"].ndarray)
+
+# returns the number of winning lines on a size^dimensions board without listing them.
+# Every line has a direction in {-1, 0, 1} on each axis, and there are (size+2)^d
+# (direction, start) pairs of which size^d are all 0, with every line found twice
+def countLines(dimensions, size):
+    return ((size+2) ** dimensions - size ** dimensions) // 2
+
+# yields every winning line of a size^dimensions board once, as a tuple of flat indices in
+# increasing order. An axis with direction 0 stays at one value, 1 runs from 0 to size-1
+# and -1 from size-1 to 0. Each line is generated from the one of its two directions
+# whose first nonzero axis is 1
+def generateLines(dimensions, size):
+    strides = [size ** i for i in range(dimensions)]
+    for direction in itertools.product((0, 1, -1), repeat=dimensions):
+        nonzero = [d for d in direction if d != 0]
+        if not nonzero or nonzero[0] != 1:
+            continue
+        start = 0
+        step = 0
+        fixed = []
+        for d, stride in zip(direction, strides):
+            if d == 0:
+                fixed.append(stride)
+            elif d == 1:
+                step += stride
+            else:
+                start += (size-1) * stride
+                step -= stride
+        for values in itertools.product(range(size), repeat=len(fixed)):
+            first = start
+            for value, stride in zip(values, fixed):
+                first += value * stride
+            last = first + (size-1) * step
+            if step > 0:
+                yield tuple(range(first, last+1, step))
+            else:
+                yield tuple(range(last, first+1, -step))
+
+# winning lines shared by every model of the same shape, keyed by (dimensions, size)
+_line_indices = dict()
+
+# returns (lines, cell_lines) for the model's board shape, building it on first use.
+# lines is a tuple holding every winning line once as a tuple of flat indices, and
+# cell_lines[index] is a tuple of the ids (positions in lines) of the lines through index
+def getLineIndex(model):
+    key = (model.dimensions, model.size)
+    if key not in _line_indices:
+        lines = tuple(generateLines(model.dimensions, model.size))
+        cell_lines = [[] for i in range(model.size ** model.dimensions)]
+        for line_id, line in enumerate(lines):
+            for index in line:
+                cell_lines[index].append(line_id)
+        _line_indices[key] = (lines, tuple(tuple(ids) for ids in cell_lines))
+    return _line_indices[key]
+
+# winning lines as (number of lines, size) numpy arrays, keyed by (dimensions, size)
+_line_matrices = dict()
+
+# returns the model's winning lines as a numpy matrix with one line of flat indices per row
+def getLineMatrix(model):
+    key = (model.dimensions, model.size)
+    if key not in _line_matrices:
+        importNumpy()
+        _line_matrices[key] = numpy.array(model.lines, dtype=numpy.intp)
+    return _line_matrices[key]
+
+# counts the pieces of each player on every line in one vectorized gather and reduce.
+# boards is a flat board or a stack of them with shape (..., size**dimensions), and the
+# result has shape (..., players+1, number of lines), with player 0 counting empty cells
+def countLinePieces(boards, line_matrix, players):
+    importNumpy()
+    cells = numpy.asarray(boards)[..., line_matrix]
+    player_ids = numpy.arange(players+1).reshape((players+1, 1, 1))
+    return (cells[..., numpy.newaxis, :, :] == player_ids).sum(axis=-1)
+
+# winning lines as integer bitmasks over flat indices, keyed by (dimensions, size)
+_line_masks = dict()
+
+# returns (masks, cell_masks, bits) for the model's board shape, where masks[line_id] has
+# the bits of the line's cells set, cell_masks[index] holds the masks of the lines through
+# index and bits[index] is 1 << index
+def getLineMasks(model):
+    key = (model.dimensions, model.size)
+    if key not in _line_masks:
+        masks = []
+        for line in model.lines:
+            mask = 0
+            for i in line:
+                mask |= 1 << i
+            masks.append(mask)
+        cell_masks = [tuple(masks[line_id] for line_id in ids) for ids in model.cell_lines]
+        bits = tuple(1 << i for i in range(len(model.cell_lines)))
+        _line_masks[key] = (tuple(masks), tuple(cell_masks), bits)
+    return _line_masks[key]
+
+# random 64 bit keys for every (index, player), keyed by (dimensions, size, players).
+# They are seeded from the board shape so hashes are the same from run to run
+_zobrist_keys = dict()
+
+# returns keys where keys[index][player] is the Zobrist key of player at index, and
+# keys[index][0] is 0 so empty cells do not change a hash
+def getZobristKeys(model):
+    key = (model.dimensions, model.size, model.players)
+    if key not in _zobrist_keys:
+        rng = random.Random("zobrist {0} {1} {2}".format(*key))
+        keys = []
+        for index in range(model.size ** model.dimensions):
+            keys.append(tuple([0] + [rng.getrandbits(64) for p in range(model.players)]))
+        _zobrist_keys[key] = tuple(keys)
+    return _zobrist_keys[key]
+
+# the symmetries of the hypercube, keyed by (dimensions, size)
+_symmetries = dict()
+
+# returns (symmetries, inverses) for the model's board shape. There are 2^n*n! of them,
+# one for every permutation of the axes combined with mirroring any of them. Symmetry s
+# is an (offset, coefficients) pair sending the cell at coord to the flat index
+# offset + sum(coord[k] * coefficients[k]), and inverses[s] is the symmetry undoing s.
+# Symmetry 0 is the identity
+def getSymmetries(model):
+    key = (model.dimensions, model.size)
+    if key not in _symmetries:
+        dimensions = model.dimensions
+        transforms = []
+        for axes in itertools.permutations(range(dimensions)):
+            for flips in itertools.product((False, True), repeat=dimensions):
+                transforms.append((axes, flips))
+        numbers = dict((transform, s) for s, transform in enumerate(transforms))
+        symmetries = []
+        inverses = []
+        for axes, flips in transforms:
+            # axis j of the image is axis axes[j] of the original, mirrored if flips[j]
+            offset = 0
+            coefficients = [0] * dimensions
+            for j in range(dimensions):
+                stride = model.size ** j
+                if flips[j]:
+                    offset += (model.size-1) * stride
+                    coefficients[axes[j]] = -stride
+                else:
+                    coefficients[axes[j]] = stride
+            symmetries.append((offset, tuple(coefficients)))
+            inverse_axes = [0] * dimensions
+            for j in range(dimensions):
+                inverse_axes[axes[j]] = j
+            inverse_flips = tuple(flips[inverse_axes[k]] for k in range(dimensions))
+            inverses.append(numbers[(tuple(inverse_axes), inverse_flips)])
+        _symmetries[key] = (tuple(symmetries), tuple(inverses))
+    return _symmetries[key]
+
+# what a subscription does with a new event when its queue is full: drop the oldest
+# queued event, drop the new one, or make the publisher wait until the subscriber,
+# running in another thread, takes some
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+
+# something that happened in a game. kind is "move" or "undo" with the index and player
+# of the move, "turn" with the player whose turn it now is, "win" with the winner, or
+# "tie". Fields that do not apply are None
+GameEvent = collections.namedtuple("GameEvent", ("kind", "index", "player"))
+
+# a bounded queue of the events of one subscriber. dropped counts the events lost to
+# the drop policies, so a subscriber can tell that it has missed some. Once closed it
+# takes no more events
+class Subscription:
+    def __init__(self, limit=1024, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError("Unknown policy " + str(policy))
+        self.events = collections.deque()
+        self.limit = limit
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, event):
+        with self.condition:
+            if self.closed:
+                return
+            if len(self.events) >= self.limit:
+                if self.policy == BLOCK:
+                    while len(self.events) >= self.limit and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        return
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                else:
+                    self.events.popleft()
+                    self.dropped += 1
+            self.events.append(event)
+            self.condition.notify_all()
+
+    # returns the oldest event, waiting up to timeout seconds (forever if None) for one,
+    # or None if there is none
+    def get(self, timeout=0):
+        with self.condition:
+            if not self.events and timeout != 0:
+                self.condition.wait_for(lambda: self.events, timeout)
+            if not self.events:
+                return None
+            event = self.events.popleft()
+            self.condition.notify_all()
+            return event
+
+    # returns every queued event, oldest first
+    def drain(self):
+        with self.condition:
+            events = list(self.events)
+            self.events.clear()
+            self.condition.notify_all()
+            return events
+
+    # stops taking events, releasing a publisher waiting on a full queue
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+# fans a model's events out to any number of subscriptions, each queueing them
+# independently so a slow subscriber only holds up others under the BLOCK policy
+class EventBus:
+    def __init__(self):
+        self.subscriptions = []
+
+    def subscribe(self, limit=1024, policy=DROP_OLDEST):
+        subscription = Subscription(limit, policy)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.remove(subscription)
+        subscription.close()
+
+    # the subscriptions are copied first, since another thread may unsubscribe one while
+    # the publisher waits on it
+    def publish(self, kind, index=None, player=None):
+        event = GameEvent(kind, index, player)
+        for subscription in list(self.subscriptions):
+            subscription.put(event)
 
 # logical representation of the n-dimensional board as a single list
+# with track_lines, each winning line keeps a piece count per player and the number of
+# players on it, so moves only touch counters and dead lines reveal forced ties early.
+# hash is the Zobrist hash of the board, and with track_symmetries the hash of the board's
+# image under every symmetry is kept too, so getCanonicalHash costs no rescan.
+# Played moves are kept on move_stack so they can be taken back with undo or unmake.
+# Once getEventBus has been called, moves, undos, turns and results are published on it
 class Model:
-    def __init__(self, dimensions=2, size=0, players=2):
-        print("{0},{1}".format(dimensions, size))
+    def __init__(self, dimensions=2, size=0, players=2, track_lines=False,
+            track_symmetries=False):
         if size < 3:
             size = dimensions+1
         self.dimensions = dimensions
@@ -16,23 +283,57 @@ class Model:
         self.players = players
         if self.players < 2 or self.players > 9:
             self.players = 2
-        self.board = [0 for i in range(size**dimensions)]
+        self.board = [0 for i in range(self.size**dimensions)]
+        # size**i for every axis, and the position in an xy coordinate of every axis
+        self.strides = tuple(self.size ** i for i in range(self.dimensions))
+        self.xy_axes = self.XYCoordToCoord(range(self.dimensions))
         self.current_player = 1
         self.game_over = False
         self.tied_game = False
         self.moves = 0
-        print("{0},{1}".format(self.dimensions, self.size))
+        self.lines, self.cell_lines = getLineIndex(self)
+        self.track_lines = track_lines
+        if track_lines:
+            self.line_counts = [[0] * (self.players+1) for line in self.lines]
+            self.line_players = [0 for line in self.lines]
+            self.live_lines = len(self.lines)
+        self.zobrist_keys = getZobristKeys(self)
+        self.hash = 0
+        self.track_symmetries = track_symmetries
+        if track_symmetries:
+            self.symmetries, self.inverse_symmetries = getSymmetries(self)
+            self.symmetry_hashes = [0 for symmetry in self.symmetries]
+        # (index, player, game_over, tied_game) for every move, with the game state
+        # from before it
+        self.move_stack = []
+        self.redo_stack = []
+        self.events = None
+
+    # returns the EventBus the model publishes its events on, creating it on first use
+    def getEventBus(self):
+        if self.events is None:
+            self.events = EventBus()
+        return self.events
+
+    # subscribers stay with the model they subscribed to, so copies sent to other
+    # processes leave the event bus behind
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["events"] = None
+        return state
 
     # makes the next player the active player
     def nextTurn(self):
         self.current_player += 1
         if self.current_player > self.players:
             self.current_player = 1
+        if self.events is not None:
+            self.events.publish("turn", None, self.current_player)
         return self.current_player
 
     def playAtCoordinate(self, coord):
         self.validateCoord(coord)
-        self.playAtIndex(self.getIndexFromCoord(coord))
+        self.playAtIndex(self.getIndexFromCoordUnchecked(coord))
 
     # puts the current player's number into this index of the array then check game over
     def playAtIndex(self, index):
@@ -40,38 +341,219 @@ class Model:
         if self.board[index] != 0:
             raise IllegalMoveError(index)
             return
-        self.board[index] = self.current_player
-        seqs = self.getSequencesFromIndex(index)
-        for seq in seqs:
-            n = 0
-            for coord in seq:
-                if self.board[self.getIndexFromCoord(coord)] == self.current_player:
-                    n += 1
-            if n == self.size:
-                self.game_over = True
-                break
+        player = self.current_player
+        self.move_stack.append((index, player, self.game_over, self.tied_game))
+        self.redo_stack = []
+        self.setCell(index, player)
+        if self.track_lines:
+            self.addLineCounts(index, player)
+        elif self.isWinningMove(index, player):
+            self.game_over = True
         self.moves += 1
-        if self.moves == self.size ** self.dimensions:
+        if not self.game_over and (self.moves == len(self.board) or
+                self.track_lines and self.live_lines == 0):
             self.tied_game = True
             self.game_over = True
-            
+        if self.events is not None:
+            self.events.publish("move", index, player)
+            # only the move that ends the game announces the result
+            if self.game_over and not self.move_stack[-1][2]:
+                if self.tied_game:
+                    self.events.publish("tie")
+                else:
+                    self.events.publish("win", None, player)
+
+    # takes back the move at index, which must be the last move played, restoring the
+    # game state from before it and making its player the current player again. The undo
+    # is published before the turn it hands back
+    def unmake(self, index):
+        if not self.move_stack or self.move_stack[-1][0] != index:
+            raise IllegalMoveError(index)
+        index, player, self.game_over, self.tied_game = self.move_stack.pop()
+        self.setCell(index, 0)
+        if self.track_lines:
+            self.removeLineCounts(index, player)
+        self.moves -= 1
+        self.current_player = player
+        if self.events is not None:
+            self.events.publish("undo", index, player)
+            self.events.publish("turn", None, player)
+        return index
+
+    # takes back the last move so it can be redone, and returns its index
+    def undo(self):
+        if not self.move_stack:
+            raise ValueError("No move to undo")
+        index, player = self.move_stack[-1][:2]
+        self.unmake(index)
+        self.redo_stack.append((index, player))
+        return index
+
+    # plays the last undone move again, and returns its index
+    def redo(self):
+        if not self.redo_stack:
+            raise ValueError("No move to redo")
+        redo_stack = self.redo_stack
+        index, self.current_player = redo_stack.pop()
+        self.playAtIndex(index)
+        self.redo_stack = redo_stack
+        return index
+
+    # stores player (or 0 to clear) at index. Subclasses extend this to keep other
+    # representations of the board in step
+    def setCell(self, index, player):
+        old = self.board[index]
+        keys = self.zobrist_keys[index]
+        self.hash ^= keys[old] ^ keys[player]
+        if self.track_symmetries:
+            coord = self.getCoordFromIndexUnchecked(index)
+            hashes = self.symmetry_hashes
+            for s, (offset, coefficients) in enumerate(self.symmetries):
+                image = offset
+                for c, k in zip(coord, coefficients):
+                    image += c * k
+                keys = self.zobrist_keys[image]
+                hashes[s] ^= keys[old] ^ keys[player]
+        self.board[index] = player
+
+    # returns whether player holds a complete line through index
+    def isWinningMove(self, index, player):
+        board = self.board
+        for line_id in self.cell_lines[index]:
+            for i in self.lines[line_id]:
+                if board[i] != player:
+                    break
+            else:
+                return True
+        return False
+
+    # adds the player's piece at index to the counters of every line through it, killing
+    # lines that now hold two players and ending the game if a line is full
+    def addLineCounts(self, index, player):
+        for line_id in self.cell_lines[index]:
+            counts = self.line_counts[line_id]
+            if counts[player] == 0:
+                self.line_players[line_id] += 1
+                if self.line_players[line_id] == 2:
+                    self.live_lines -= 1
+            counts[player] += 1
+            if counts[player] == self.size:
+                self.game_over = True
+
+    # removes the player's piece at index from the counters of every line through it,
+    # reviving lines the player was sharing with one other player
+    def removeLineCounts(self, index, player):
+        for line_id in self.cell_lines[index]:
+            counts = self.line_counts[line_id]
+            counts[player] -= 1
+            if counts[player] == 0:
+                self.line_players[line_id] -= 1
+                if self.line_players[line_id] == 1:
+                    self.live_lines += 1
+
+    # returns the index that symmetry number s sends index to
+    def getSymmetricIndex(self, index, s):
+        offset, coefficients = getSymmetries(self)[0][s]
+        image = offset
+        for c, k in zip(self.getCoordFromIndexUnchecked(index), coefficients):
+            image += c * k
+        return image
+
+    # returns the Zobrist hash of the board's image under every symmetry, in order
+    def getSymmetryHashes(self):
+        if self.track_symmetries:
+            return self.symmetry_hashes[:]
+        symmetries = getSymmetries(self)[0]
+        hashes = [0 for symmetry in symmetries]
+        for index, player in enumerate(self.board):
+            if player != 0:
+                for s in range(len(symmetries)):
+                    hashes[s] ^= self.zobrist_keys[self.getSymmetricIndex(index, s)][player]
+        return hashes
+
+    # returns the smallest hash of any symmetric image of the board, which is the same
+    # for every position equivalent under symmetry
+    def getCanonicalHash(self):
+        return min(self.getSymmetryHashes())
+
+    # returns (s, image) where image is the lexicographically smallest symmetric image of
+    # the board as a tuple and s is a symmetry producing it
+    def getCanonicalBoard(self):
+        best = None
+        for s in range(len(getSymmetries(self)[0])):
+            image = [0] * len(self.board)
+            for index, player in enumerate(self.board):
+                if player != 0:
+                    image[self.getSymmetricIndex(index, s)] = int(player)
+            image = tuple(image)
+            if best is None or image < best[1]:
+                best = (s, image)
+        return best
 
     def getIndexFromCoord(self, coord):
         self.validateCoord(coord)
-        index = 0
-        for i in range(len(coord)-1,-1,-1):
-            index += coord[i]*(self.size**i)
-        return index
+        return self.getIndexFromCoordUnchecked(coord)
 
     def getCoordFromIndex(self, index):
         self.validateIndex(index)
-        coord_list = []
+        return self.getCoordFromIndexUnchecked(index)
+
+    # getIndexFromCoord without validation, for coordinates known to be on the board
+    def getIndexFromCoordUnchecked(self, coord):
+        index = 0
+        for c, stride in zip(coord, self.strides):
+            index += c * stride
+        return index
+
+    # getCoordFromIndex without validation, for indices known to be on the board
+    def getCoordFromIndexUnchecked(self, index):
+        coord = []
         for i in range(self.dimensions):
-            nd = self.size**(self.dimensions-1-i)
-            coord_list.append(index//nd)
-            index %= nd
-        coord_list.reverse()
-        return tuple(coord_list)
+            index, c = divmod(index, self.size)
+            coord.append(c)
+        return tuple(coord)
+
+    # converts a sequence of coordinates to flat indices at once. A numpy array of shape
+    # (n, dimensions) is converted with array operations and gives an array of indices
+    def getIndicesFromCoords(self, coords, check=True):
+        if isArray(coords):
+            importNumpy()
+            if check and (coords.shape[-1] != self.dimensions or coords.size and
+                    (coords.min() < 0 or coords.max() >= self.size)):
+                raise ValueError("0 <= coordinate < " + str(self.size))
+            return coords.dot(numpy.array(self.strides))
+        if check:
+            for coord in coords:
+                self.validateCoord(coord)
+        return [self.getIndexFromCoordUnchecked(coord) for coord in coords]
+
+    # converts a sequence of flat indices to coordinates at once. A numpy array of n
+    # indices is converted with array operations and gives an array of shape
+    # (n, dimensions)
+    def getCoordsFromIndices(self, indices, check=True):
+        if isArray(indices):
+            importNumpy()
+            if check and indices.size and (indices.min() < 0 or
+                    indices.max() >= len(self.board)):
+                raise ValueError("Invalid index")
+            return indices[..., numpy.newaxis] // numpy.array(self.strides) % self.size
+        if check:
+            for index in indices:
+                self.validateIndex(index)
+        return [self.getCoordFromIndexUnchecked(index) for index in indices]
+
+    # converts a sequence of full xy coordinates to model coordinates at once. A numpy
+    # array of shape (n, dimensions) gives an array of the same shape
+    def XYCoordsToCoords(self, xys):
+        if isArray(xys):
+            return xys[..., list(self.xy_axes)]
+        axes = self.xy_axes
+        return [tuple(xy[i] for i in axes) for xy in xys]
+
+    # returns the winning lines through this index as tuples of flat indices
+    def getLinesFromIndex(self, index):
+        self.validateIndex(index)
+        return [self.lines[line_id] for line_id in self.cell_lines[index]]
 
     def getSequencesFromIndex(self, index):
         return self.getSequencesFromCoord(self.getCoordFromIndex(index))
@@ -154,17 +636,142 @@ class Model:
      
     # xy pairs from high order to low order to model coordinates           
     def XYCoordToCoord(self, xy):
-        coord = []
-        start = 0
-        if self.dimensions % 2 == 1:
-            start = 1
-        for i in range(start+1, len(xy), 2):
-            coord.insert(0, xy[i])
+        start = self.dimensions % 2
+        coord = list(xy[start::2])
+        coord.reverse()
         if start == 1:
-            coord.insert(0, xy[0])
-        for i in range(start, len(xy), 2):
-            coord.insert(0, xy[i])
-        return tuple(coord)
+            coord.append(xy[0])
+        high = list(xy[start+1::2])
+        high.reverse()
+        return tuple(coord + high)
+
+    # model coordinates to full xy coordinates, undoing XYCoordToCoord
+    def CoordToXYCoord(self, coord):
+        xy = [0] * self.dimensions
+        for c, axis in zip(coord, self.xy_axes):
+            xy[axis] = c
+        return xy
+
+# a model whose board is a flat numpy array instead of a list, for evaluating whole
+# positions as array operations. Requires numpy
+class NumpyModel(Model):
+    def __init__(self, dimensions=2, size=0, players=2, track_lines=False,
+            track_symmetries=False):
+        if importNumpy() is None:
+            raise ImportError("NumpyModel requires numpy")
+        Model.__init__(self, dimensions, size, players, track_lines, track_symmetries)
+        self.board = numpy.zeros(len(self.board), dtype=numpy.int8)
+        self.line_matrix = getLineMatrix(self)
+
+    # the board as an array of shape (size,)*dimensions indexed by model coordinates.
+    # It shares memory with board, so it always reflects the current position
+    def getArray(self):
+        return self.board.reshape((self.size,)*self.dimensions, order="F")
+
+    # returns an array of shape (players+1, number of lines) with the pieces of each
+    # player on every winning line, row 0 counting empty cells
+    def getLineCounts(self):
+        return countLinePieces(self.board, self.line_matrix, self.players)
+
+    # returns the players that have filled a winning line
+    def getWinners(self):
+        full = (self.getLineCounts()[1:] == self.size).any(axis=1)
+        return [int(p)+1 for p in numpy.flatnonzero(full)]
+
+# a model that also keeps one integer bitmask per player, with bit i of masks[player] set
+# when the player holds index i and masks[0] left 0. A line is won when
+# (mask & line_mask) == line_mask, so moves are made, unmade and checked for a win on the
+# masks without walking the board, and a position can be copied, hashed and compared
+# through its masks alone
+class BitboardModel(Model):
+    def __init__(self, dimensions=2, size=0, players=2, track_lines=False,
+            track_symmetries=False):
+        Model.__init__(self, dimensions, size, players, track_lines, track_symmetries)
+        self.masks = [0 for p in range(self.players+1)]
+        self.line_masks, self.cell_masks, self.bits = getLineMasks(self)
+
+    def setCell(self, index, player):
+        old = self.board[index]
+        if old != 0:
+            self.masks[old] ^= self.bits[index]
+        if player != 0:
+            self.masks[player] |= self.bits[index]
+        Model.setCell(self, index, player)
+
+    # plays like Model.playAtIndex, but tests the cell and the lines through it on the
+    # masks and updates the board, masks and hash in place rather than through setCell.
+    # Models tracking symmetries or publishing events take the full path
+    def playAtIndex(self, index):
+        if self.track_symmetries or self.events is not None:
+            Model.playAtIndex(self, index)
+            return
+        board = self.board
+        if index < 0 or index >= len(board):
+            raise ValueError("Invalid index")
+        if board[index] != 0:
+            raise IllegalMoveError(index)
+        player = self.current_player
+        self.move_stack.append((index, player, self.game_over, self.tied_game))
+        if self.redo_stack:
+            self.redo_stack = []
+        board[index] = player
+        mask = self.masks[player] | self.bits[index]
+        self.masks[player] = mask
+        self.hash ^= self.zobrist_keys[index][player]
+        if self.track_lines:
+            self.addLineCounts(index, player)
+        else:
+            for line_mask in self.cell_masks[index]:
+                if mask & line_mask == line_mask:
+                    self.game_over = True
+                    break
+        self.moves += 1
+        if not self.game_over and (self.moves == len(board) or
+                self.track_lines and self.live_lines == 0):
+            self.tied_game = True
+            self.game_over = True
+
+    # takes back the last move like Model.unmake, clearing its bit in place
+    def unmake(self, index):
+        if self.track_symmetries or self.events is not None:
+            return Model.unmake(self, index)
+        if not self.move_stack or self.move_stack[-1][0] != index:
+            raise IllegalMoveError(index)
+        index, player, self.game_over, self.tied_game = self.move_stack.pop()
+        self.masks[player] ^= self.bits[index]
+        self.board[index] = 0
+        self.hash ^= self.zobrist_keys[index][player]
+        if self.track_lines:
+            self.removeLineCounts(index, player)
+        self.moves -= 1
+        self.current_player = player
+        return index
+
+    def isWinningMove(self, index, player):
+        mask = self.masks[player]
+        for line_mask in self.cell_masks[index]:
+            if mask & line_mask == line_mask:
+                return True
+        return False
+
+    # returns a hashable key identifying the pieces on the board
+    def getPositionKey(self):
+        return tuple(self.masks[1:])
+
+    # returns an independent model in the same state
+    def copy(self):
+        other = copy.copy(self)
+        other.board = self.board[:]
+        other.masks = self.masks[:]
+        if self.track_lines:
+            other.line_counts = [counts[:] for counts in self.line_counts]
+            other.line_players = self.line_players[:]
+        if self.track_symmetries:
+            other.symmetry_hashes = self.symmetry_hashes[:]
+        other.move_stack = self.move_stack[:]
+        other.redo_stack = self.redo_stack[:]
+        other.events = None
+        return other
 
 class IllegalMoveError(Exception):
     def __init__(self, index):
@@ -174,6 +781,10 @@ class IllegalMoveError(Exception):
         return "Illegal move at index " + str(self.index)
 
 
+# blank board text as ASCII bytes, maps between model and view indices and the screen
+# geometry of cells and blocks, keyed by (dimensions, size)
+_view_layouts = dict()
+
 # A view for the model. Other views might use Curses or a graphics library        
 class PlainTextView():
     def __init__(self, model):
@@ -200,68 +811,88 @@ class PlainTextView():
             div.insert(1, "-")
         return div
     
-    # recursively create the board as a matrix of characters
+    # recursively create the board as a list of row strings, along with the columns of
+    # the cells in each row. Cells are blank and numbered in reading order
     def createMatrix(self, d):
         if d < 0: return
-        if d == 0: return [["X"]]
+        if d == 0: return [" "], [[0]]
         
-        sub_block = self.createMatrix(d-1)
-        returned = []
+        sub_rows, sub_cols = self.createMatrix(d-1)
+        size = self.model.size
         
         if d % 2 == 1:
-            divider = self.getHorizontalDivider(d // 2)
-            for row in sub_block:
-                new_row = []
-                for char in row:
-                    new_row.append(char)
-                for i in range(self.model.size - 1):
-                    for char in divider:
-                        new_row.append(char)
-                    for char in row:
-                        new_row.append(char)
-                returned.append(new_row)
-            return returned
+            divider = "".join(self.getHorizontalDivider(d // 2))
+            step = len(sub_rows[0]) + len(divider)
+            rows = [divider.join([row] * size) for row in sub_rows]
+            cols = [[col + i * step for i in range(size) for col in row_cols]
+                for row_cols in sub_cols]
+            return rows, cols
         
         if d % 2 == 0:
             divider = self.getVerticalDivider(d // 2 - 1)
-            for row in sub_block:
-                new_row = []
-                for char in row:
-                    new_row.append(char)
-                returned.append(new_row)
-            for i in range (self.model.size - 1):
+            width = len(sub_rows[0])
+            rows = list(sub_rows)
+            cols = list(sub_cols)
+            for i in range(size - 1):
                 for char in divider:
-                    new_row = []
-                    for j in range(len(sub_block[0])):
-                        new_row.append(char)
-                    returned.append(new_row)
-                for row in sub_block:
-                    new_row = []
-                    for char in row:
-                        new_row.append(char)
-                    returned.append(new_row)
-            return returned
+                    rows.append(char * width)
+                    cols.append([])
+                rows.extend(sub_rows)
+                cols.extend(sub_cols)
+            return rows, cols
             
-    # use the matrix of characters that make up the board to create maps from the
-    # representation's indices to the models and vice versa, and create an str
+    # use the rows and cell columns that make up the board to create maps from the
+    # representation's indices to the models and vice versa, and fill a mutable buffer
+    # with the board's text. cell_positions[index] is the (row, column) of a model index,
+    # and rectangles maps every prefix of an xy coordinate, as a tuple, to the
+    # (min_row, min_col, max_row, max_col) of the block of cells it selects. Boards of
+    # the same shape share one layout
     def create(self):
-        matrix = self.createMatrix(self.model.dimensions)
-        self.str_rep = ""
-        for row in matrix:
-            for char in row:
-                self.str_rep += char
-            self.str_rep += "\n" 
-        #print(str_rep)          
-        self.model_to_view = dict()
-        self.view_to_model = dict()
-        model_index = 0
-        for i in range(len(self.str_rep)):
-            if self.str_rep[i] == "X":
-                self.str_rep = self.str_rep.replace("X", " ", 1)
-                self.model_to_view[model_index] = i
-                self.view_to_model[i] = model_index
-                model_index += 1
+        key = (self.model.dimensions, self.model.size)
+        if key not in _view_layouts:
+            rows, cols = self.createMatrix(self.model.dimensions)
+            text = ("\n".join(rows) + "\n").encode("ascii")
+            model_to_view = []
+            line_length = len(rows[0]) + 1
+            for row, row_cols in enumerate(cols):
+                offset = row * line_length
+                for col in row_cols:
+                    model_to_view.append(offset + col)
+            view_to_model = dict((i, index) for index, i in enumerate(model_to_view))
+            cell_positions = [divmod(i, line_length) for i in model_to_view]
+            rectangles = self.createRectangles(cell_positions)
+            _view_layouts[key] = (text, model_to_view, view_to_model, cell_positions,
+                rectangles)
+        text, self.model_to_view, self.view_to_model, self.cell_positions, \
+            self.rectangles = _view_layouts[key]
+        self.buffer = bytearray(text)
+        self.width = text.index(b"\n")
+        self.height = len(text) // (self.width+1)
         
+    # maps every prefix of every xy coordinate to the rectangle of the cells it selects,
+    # which runs from the cell with the rest of the coordinate all 0 to the cell with it
+    # all size-1
+    def createRectangles(self, cell_positions):
+        model = self.model
+        # the flat index of an xy coordinate is the sum of xy[i] * weights[i]
+        weights = [0] * model.dimensions
+        for j, i in enumerate(model.XYCoordToCoord(range(model.dimensions))):
+            weights[i] = model.size ** j
+        rectangles = dict()
+        for k in range(1, model.dimensions+1):
+            tail = (model.size-1) * sum(weights[k:])
+            for prefix in itertools.product(range(model.size), repeat=k):
+                index = 0
+                for x, weight in zip(prefix, weights):
+                    index += x * weight
+                rectangles[prefix] = cell_positions[index] + cell_positions[index+tail]
+        return rectangles
+
+    # returns (min_row, min_col, max_row, max_col) of the cells selected by a prefix of
+    # an xy coordinate
+    def getEnclosingRectangle(self, xycoord):
+        return self.rectangles[tuple(xycoord)]
+
     # given char from model, return char for display
     def getDisplayChar(self, c):
         if c == 0: return " "
@@ -272,24 +903,90 @@ class PlainTextView():
     
     # must be called to update the view when the state of index i in the model changes
     def update(self, i):
-        index = self.model_to_view[i]
-        char = self.getDisplayChar(self.model.board[i])
-        self.str_rep = self.str_rep[:index] + char + self.str_rep[index+1:]
+        self.setCell(i, self.model.board[i])
+
+    # shows player, or 0 for empty, at index i whatever the model now holds
+    def setCell(self, i, player):
+        self.buffer[self.model_to_view[i]] = ord(self.getDisplayChar(player))
+
+    # follows the model's events instead of being told about changes with update. Call
+    # applyEvents to bring the view up to date
+    def subscribe(self, limit=1024, policy=DROP_OLDEST):
+        self.subscription = self.model.getEventBus().subscribe(limit, policy)
+        self.dropped = self.subscription.dropped
+
+    def unsubscribe(self):
+        self.model.getEventBus().unsubscribe(self.subscription)
+        self.subscription = None
+
+    # shows the moves and undos published since the last call and returns the indices
+    # changed. If events were dropped the whole board is read from the model again
+    def applyEvents(self):
+        events = self.subscription.drain()
+        if self.subscription.dropped != self.dropped:
+            self.dropped = self.subscription.dropped
+            for i in range(len(self.model.board)):
+                self.update(i)
+            return list(range(len(self.model.board)))
+        changed = []
+        for event in events:
+            if event.kind == "move":
+                self.setCell(event.index, event.player)
+                changed.append(event.index)
+            elif event.kind == "undo":
+                self.setCell(event.index, 0)
+                changed.append(event.index)
+        return changed
+
+    # returns (row, column) of a position in the board's text
+    def getRowCol(self, index):
+        return divmod(index, self.width+1)
+
+    # returns row r of the board, without its newline, as a memoryview of the buffer
+    def getRow(self, r):
+        start = r * (self.width+1)
+        return memoryview(self.buffer)[start:start+self.width]
     
     def __str__(self):            
-        return self.str_rep
+        return self.buffer.decode("ascii")
+
 
+# returns the xy coordinate written in text as integers separated by commas and/or
+# spaces, optionally in parentheses or brackets, such as "1,2", "1 2" or "(1, 2)"
+def parseMove(text):
+    text = text.strip()
+    if text and text[0] in "([" and text[-1] in ")]":
+        text = text[1:-1]
+    parts = text.replace(",", " ").split()
+    if not parts:
+        raise ValueError("No coordinate given")
+    return tuple(int(part) for part in parts)
 
-# serves as a "Main" class and controls user interface with model and view
+# serves as a "Main" class and controls user interface with model and view. Given a
+# stream of moves and/or computer players, the moves are played first and the computers,
+# taking the seats in turn order, finish the game. Nothing is prompted, every move is
+# written to trace if given, and only the result is printed, after the board if
+# show_board
 class TextGameController():
-    def __init__(self):
-        dimensions = int(input("dimensions: "))
-        size = int(input("size: "))
-        players = int(input("players: "))
-        print("creating model...")
-        self.board = Model(dimensions, size, players)
-        print("creating view...")
+    def __init__(self, model=None, moves=None, computers=None, trace=None,
+            show_board=True):
+        if model is None:
+            dimensions = int(input("dimensions: "))
+            size = int(input("size: "))
+            players = int(input("players: "))
+            print("creating model...")
+            model = Model(dimensions, size, players)
+            print("creating view...")
+        self.board = model
         self.view = PlainTextView(self.board)
+        self.trace = trace
+        if moves is not None or computers:
+            if moves is not None:
+                self.playMoves(moves)
+            if computers:
+                self.playComputers(computers)
+            self.printResult(show_board)
+            return
         
         while True:
             print()
@@ -308,13 +1005,62 @@ class TextGameController():
                 break
             self.board.nextTurn()
     
+    # plays the moves in a stream of lines, one xy coordinate per line or several
+    # separated by semicolons, until the game ends. Anything after a # is a comment.
+    # Raises ValueError naming the line of a move that cannot be played
+    def playMoves(self, lines):
+        board = self.board
+        for number, line in enumerate(lines, 1):
+            for text in line.split("#", 1)[0].split(";"):
+                if not text.strip():
+                    continue
+                if board.game_over:
+                    return
+                try:
+                    coord = board.XYCoordToCoord(parseMove(text))
+                    board.playAtCoordinate(coord)
+                except (ValueError, IllegalMoveError) as e:
+                    raise ValueError("line {0}: {1}: {2}".format(number, text.strip(), e))
+                self.showMove(board.getIndexFromCoordUnchecked(coord))
+
+    # lets the computers, which choose moves with chooseMove(model), play until the end
+    def playComputers(self, computers):
+        board = self.board
+        while not board.game_over:
+            index = computers[(board.current_player-1) % len(computers)].chooseMove(board)
+            board.playAtIndex(index)
+            self.showMove(index)
+
+    # updates the view and trace after a move at index and passes the turn on
+    def showMove(self, index):
+        board = self.board
+        self.view.update(index)
+        if self.trace is not None:
+            xy = board.CoordToXYCoord(board.getCoordFromIndexUnchecked(index))
+            self.trace.write("{0} # player {1}\n".format(",".join(str(i) for i in xy),
+                board.current_player))
+        if not board.game_over:
+            board.nextTurn()
+
+    # prints how the game ended, or whose turn it is if it goes on, after the board if
+    # show_board
+    def printResult(self, show_board=True):
+        if show_board:
+            print(self.view)
+        if not self.board.game_over:
+            print("Player {0} to move".format(self.board.current_player))
+        elif self.board.tied_game:
+            print("It's a tie :(")
+        else:
+            print("Player {0} wins!".format(self.board.current_player))
+
     # transform user input to model coordinates
     # and coordinates through necessary checks, repeating if necessary   
     def makeMove(self, prompt):
         coord = None
         while True:
             try:
-                raw_in = eval("(" + input(prompt) + ")")
+                raw_in = parseMove(input(prompt))
                 coord = self.board.XYCoordToCoord(raw_in)
                 print(coord)
             except Exception as e:
@@ -356,40 +1102,38 @@ class CursesController:
             
         centerSelected()
     
-        def getEnclosingRectangle(coord):
-            extension = range(model.dimensions - len(coord))
-            min_xycoord = coord[:]
-            min_xycoord.extend([0 for i in extension])
-            min_coord = model.XYCoordToCoord(min_xycoord)
-            max_xycoord = coord[:]
-            max_xycoord.extend([model.size-1 for i in extension])
-            max_coord = model.XYCoordToCoord(max_xycoord)
-            min_index = view.model_to_view[model.getIndexFromCoord(min_coord)]
-            min_index = min_index - str(view).count("\n",0, min_index)
-            max_index = view.model_to_view[model.getIndexFromCoord(max_coord)]
-            max_index = max_index - str(view).count("\n",0, max_index)
-            length = str(view).find("\n")
-            min_x = min_index % length
-            min_y = min_index // length
-            max_x = max_index % length
-            max_y = max_index // length
-            return (min_y,min_x,max_y,max_x)
-        
         def getPlayerColor(p):
             colors = {1:4,2:1,3:2,4:3,5:5,6:6,7:7,8:5,9:7}
             return colors[((p-1)%9)+1]
         
         curses.curs_set(0)
-        win = curses.newpad(str(view).count("\n")+1, str(view).find("\n")+1)
+        win = curses.newpad(view.height+1, view.width+1)
     
         for i in range(1,8):
             curses.init_pair(i,i,0)
 
         history = []
-    
-        initialized = False
-    
-        while not model.game_over: 
+        panel_width = model.dimensions * 2 + 11
+        remote = self.remote
+        # playing on a server, keys are polled so moves from the network are shown
+        # while waiting for input
+        if remote is not None:
+            win.timeout(50)
+        # set once the server's connection is lost, after which moves are refused
+        disconnected = False
+
+        # Only what changed is redrawn each frame: board rows in dirty_rows, panel lines
+        # whose text changed, and the outlines when the terminal is resized
+        dirty_rows = set(range(view.height))
+        # board column -> player of the moves on each board row, for highlighting
+        played = dict()
+        # (rectangle, player) of the highlighted selection
+        selection = None
+        # text last drawn on each panel line
+        panel_lines = dict()
+        history_changed = True
+
+        def drawOutlines():
             stdscr.clear()
         
             # Title Box Outline
@@ -399,8 +1143,6 @@ class CursesController:
             stdscr.vline(1,0,curses.ACS_VLINE,3)
             stdscr.vline(1,curses.COLS-1,curses.ACS_VLINE,3)
         
-            panel_width = model.dimensions * 2 + 11
-        
             # Board Area Outline
             stdscr.addch(4,0,curses.ACS_ULCORNER)
             stdscr.hline(4,1,curses.ACS_HLINE,curses.COLS-panel_width-1)
@@ -430,8 +1172,53 @@ class CursesController:
             title = "N-Dimensional Tic-Tac-Toe ({0}^{1})"\
                 .format(model.size,model.dimensions)
             stdscr.addstr(2, curses.COLS//2 - len(title)//2, title)
-        
-     
+
+        # draws text at column x of panel line y unless it is already there
+        def drawPanelLine(y, x, text, attr):
+            if panel_lines.get(y) == (x, text, attr):
+                return
+            panel_lines[y] = (x, text, attr)
+            stdscr.addstr(y, curses.COLS-panel_width+1, " " * (panel_width-2))
+            stdscr.addstr(y, x, text, attr)
+
+        # redraws row y of the board with the selection and past moves highlighted
+        def drawBoardRow(y):
+            win.addstr(y, 0, view.getRow(y).tobytes())
+            (min_y,min_x,max_y,max_x), player = selection
+            selected = min_y <= y <= max_y
+            if selected:
+                win.chgat(y, min_x, max_x + 1 - min_x,
+                    curses.A_REVERSE | curses.color_pair(getPlayerColor(player)))
+            for x, p in played.get(y, dict()).items():
+                if selected and min_x <= x <= max_x:
+                    win.chgat(y, x, 1, curses.color_pair(getPlayerColor(p)))
+                else:
+                    win.chgat(y, x, 1,
+                        curses.color_pair(getPlayerColor(p)) | curses.A_REVERSE)
+
+        # shows a move just made on the model, with locked the xy coordinate it was made at
+        def showMove(index, locked):
+            nonlocal history_changed
+            view.update(index)
+            y, x = view.cell_positions[index]
+            played.setdefault(y, dict())[x] = model.current_player
+            dirty_rows.add(y)
+            history.insert(0, (model.current_player, locked))
+            history_changed = True
+            if not model.game_over:
+                model.nextTurn()
+
+        # plays a move sent by the server
+        def playRemoteMove(player, index):
+            model.current_player = player
+            model.playAtIndex(index)
+            showMove(index, model.CoordToXYCoord(model.getCoordFromIndex(index)))
+
+        drawOutlines()
+    
+        initialized = False
+    
+        while not model.game_over: 
             # Get input
             key = None
             curses.flushinp()
@@ -439,6 +1226,13 @@ class CursesController:
                 key = win.getch()
             else:
                 initialized = True
+
+            if key == curses.KEY_RESIZE:
+                curses.update_lines_cols()
+                drawOutlines()
+                panel_lines.clear()
+                history_changed = True
+                win.touchwin()
         
             if key == ord("w"):
                 if selected_y == 0 or len(locked_coords) == 0 and uneven:
@@ -473,15 +1267,37 @@ class CursesController:
                 if len(locked_coords) == model.dimensions:
                         try:
                             coord = model.XYCoordToCoord(locked_coords)
-                            model.playAtCoordinate(coord)
-                            view.update(model.getIndexFromCoord(coord))
-                            history.insert(0, (model.current_player, locked_coords[:]))
+                            index = model.getIndexFromCoord(coord)
+                            if remote is None:
+                                model.playAtCoordinate(coord)
+                                showMove(index, locked_coords[:])
+                            elif disconnected:
+                                alert()
+                                raise IllegalMoveError(index)
+                            elif (model.current_player != remote.player or
+                                    model.board[index] != 0):
+                                raise IllegalMoveError(index)
+                            else:
+                                # shown once the server sends the move back
+                                remote.sendMove(coord)
                             del locked_coords[:]
                             centerSelected()
-                            if not model.game_over:
-                                model.nextTurn()
                         except Exception:
                             key = curses.ascii.ESC
+
+            if key == ord("u"):
+                if len(history) == 0 or remote is not None:
+                    alert()
+                else:
+                    index = model.undo()
+                    view.update(index)
+                    y, x = view.cell_positions[index]
+                    del played[y][x]
+                    dirty_rows.add(y)
+                    del history[0]
+                    history_changed = True
+                    del locked_coords[:]
+                    centerSelected()
             
             if key == curses.ascii.ESC:
                 if len(locked_coords) == 0:
@@ -495,10 +1311,26 @@ class CursesController:
                     else:
                         selected_x = selected_y
                         selected_y = 0
+
+            # Apply what came from the server
+            if remote is not None:
+                for message in remote.getMessages():
+                    if message["type"] == "joined":
+                        for i, index in enumerate(message["moves"]):
+                            playRemoteMove(i % model.players + 1, index)
+                    elif message["type"] == "moved":
+                        playRemoteMove(message["player"], message["index"])
+                    elif message["type"] == "disconnected":
+                        disconnected = True
+                        alert()
+                    elif message["type"] == "error":
+                        alert()
+                if model.game_over:
+                    break
                     
             # Draw info box contents
             info_line = "Player {0}".format(model.current_player)
-            stdscr.addstr(6, round(curses.COLS-(panel_width + len(info_line))/2),
+            drawPanelLine(6, round(curses.COLS-(panel_width + len(info_line))/2),
                 info_line,
                 curses.color_pair(getPlayerColor(model.current_player)))
             info_coord = locked_coords[:]
@@ -506,51 +1338,54 @@ class CursesController:
             if not (len(locked_coords) == 0 and uneven):
                 info_coord.append(selected_y)
             info_line = str(info_coord)[1:-1].replace(" ", "")
-            stdscr.addstr(7, round(curses.COLS-(panel_width + len(info_line))/2),
+            drawPanelLine(7, round(curses.COLS-(panel_width + len(info_line))/2),
                 info_line,
                 curses.color_pair(getPlayerColor(model.current_player)))
+            if remote is not None:
+                info_line = "Spectating"
+                if disconnected:
+                    info_line = "Offline"
+                elif remote.player is not None:
+                    info_line = "You: {0}".format(remote.player)
+                drawPanelLine(8, round(curses.COLS-(panel_width + len(info_line))/2),
+                    info_line, 0)
         
         
             # Draw move history
-            for i, move in enumerate(history):
-                if 10 + i == curses.LINES -1:
-                    break
-                p, loc = move
-                loc = str(loc)[1:-1].replace(" ", "")
-                stdscr.addstr(10+i, curses.COLS-panel_width+1,
-                    "Player {0}: {1}".format(p, loc),
-                    curses.color_pair(getPlayerColor(p)))
-        
-            # Draw board
-            win.addstr(0,0, str(view))
-        
+            if history_changed:
+                history_changed = False
+                for i in range(curses.LINES - 11):
+                    if i < len(history):
+                        p, loc = history[i]
+                        loc = str(loc)[1:-1].replace(" ", "")
+                        drawPanelLine(10+i, curses.COLS-panel_width+1,
+                            "Player {0}: {1}".format(p, loc),
+                            curses.color_pair(getPlayerColor(p)))
+                    else:
+                        drawPanelLine(10+i, curses.COLS-panel_width+1, "", 0)
         
-            # Highlight selected area       
+            # Highlight selected area, redrawing the rows it leaves and enters
             coord = locked_coords[:]
             coord.append(selected_x)
             if not (len(locked_coords) == 0 and uneven):
                 coord.append(selected_y)
-            min_y,min_x,max_y,max_x = getEnclosingRectangle(coord)
-            for y in range(min_y, max_y+1):
-                win.chgat(y, min_x, max_x + 1 - min_x,
-                    curses.A_REVERSE |
-                    curses.color_pair(getPlayerColor(model.current_player)))
-            
-            # Highlight past moves
-            for p, loc in history:
-                rect = getEnclosingRectangle(loc)
-                current = win.inch(rect[0], rect[1])
-                if current == current | curses.A_REVERSE:
-                    win.chgat(rect[0], rect[1], 1, curses.color_pair(getPlayerColor(p)))
-                else:
-                    win.chgat(rect[0], rect[1], 1,
-                        curses.color_pair(getPlayerColor(p)) | curses.A_REVERSE)
+            min_y,min_x,max_y,max_x = view.getEnclosingRectangle(coord)
+            if selection != ((min_y,min_x,max_y,max_x), model.current_player):
+                if selection is not None:
+                    dirty_rows.update(range(selection[0][0], selection[0][2]+1))
+                dirty_rows.update(range(min_y, max_y+1))
+                selection = ((min_y,min_x,max_y,max_x), model.current_player)
+
+            # Draw board rows that changed
+            for y in dirty_rows:
+                drawBoardRow(y)
+            dirty_rows.clear()
         
             # Calculate area of board to display
             pminrow = 0
             pmincol = 0
-            pheight = str(view).count("\n")-1
-            pwidth = str(view).find("\n")-1
+            pheight = view.height-1
+            pwidth = view.width-1
             sminrow = 5
             smincol = 1
             smaxrow = curses.LINES-2
@@ -586,9 +1421,10 @@ class CursesController:
                     dif = swidth - pwidth
                     smincol += dif // 2
 
-            # Refresh the display
-            stdscr.refresh()
-            win.refresh(pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol)
+            # Refresh the display in one update
+            stdscr.noutrefresh()
+            win.noutrefresh(pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol)
+            curses.doupdate()
         
         
         stdscr.clear()
@@ -604,16 +1440,65 @@ class CursesController:
                 curses.A_BLINK | curses.A_REVERSE)
         stdscr.getch()
         
-    def __init__(self, model):
+    # with remote, a RemoteGame, the game is played on a server instead of hot-seat
+    def __init__(self, model, remote=None):
         self.model = model
+        self.remote = remote
         self.view = PlainTextView(self.model)
         curses.wrapper(self.main)
         
-# run the game if run as a script
-if __name__ == "__main__":      
-    #TextGameController()
-    args = [int(i) for i in sys.argv[1:]]
-    if args:
-        CursesController(Model(*args))
-    else:
-        CursesController(Model(4))
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="N-Dimensional Tic-Tac-Toe. Without "
+        "moves or computer players the game is played in curses.")
+    parser.add_argument("config", nargs="*", type=int,
+        help="dimensions, size and players (default 4 dimensions)")
+    parser.add_argument("--text", action="store_true",
+        help="play in the terminal without curses")
+    parser.add_argument("-m", "--moves",
+        help="file of xy coordinates to play, one per line, - for standard input")
+    parser.add_argument("-a", "--ai",
+        help="comma separated computer players in turn order, from random, greedy, "
+        "alphabeta and mcts, finishing the game after any moves")
+    parser.add_argument("-t", "--think", type=float, default=0.1,
+        help="seconds per move for searching computer players")
+    parser.add_argument("-s", "--seed", default="0", help="random seed of computer players")
+    parser.add_argument("--trace", action="store_true",
+        help="print every move as a line that can be played again with --moves")
+    parser.add_argument("--board", action="store_true", help="print the final board")
+    args = parser.parse_args(argv)
+    if len(args.config) > 3:
+        parser.error("expected at most dimensions, size and players")
+    model = Model(*(args.config or [4]))
+    if args.moves is None and args.ai is None:
+        if args.text:
+            TextGameController(model)
+        else:
+            CursesController(model)
+        return
+    computers = None
+    if args.ai is not None:
+        # imported here because the computer players import this module
+        from TicTacToeAI import PLAYER_KINDS, createPlayer
+        kinds = args.ai.split(",")
+        for kind in kinds:
+            if kind not in PLAYER_KINDS:
+                parser.error("unknown computer player " + kind)
+        computers = [createPlayer(kind, "{0}:{1}".format(args.seed, p), args.think)
+            for p, kind in enumerate(kinds)]
+    trace = sys.stdout if args.trace else None
+    try:
+        if args.moves == "-":
+            TextGameController(model, sys.stdin, computers, trace, args.board)
+        elif args.moves is not None:
+            with open(args.moves) as moves:
+                TextGameController(model, moves, computers, trace, args.board)
+        else:
+            TextGameController(model, None, computers, trace, args.board)
+    except (OSError, ValueError) as e:
+        parser.exit(2, "{0}: error: {1}\n".format(parser.prog, e))
+
+# run the game if run as a script. Modules importing TicTacToe, such as the computer
+# players, are given this module rather than loading a second copy with its own caches
+if __name__ == "__main__":
+    sys.modules.setdefault("TicTacToe", sys.modules[__name__])
+    main()
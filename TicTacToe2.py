@@ -278,6 +278,17 @@ class PlainTextView():
         return self.str_rep
 
 
+# returns the xy coordinate written in text as integers separated by commas and/or
+# spaces, optionally in parentheses or brackets, such as "1,2", "1 2" or "(1, 2)"
+def parseMove(text):
+    text = text.strip()
+    if text and text[0] in u"([" and text[-1] in u")]":
+        text = text[1:-1]
+    parts = text.replace(u",", u" ").split()
+    if not parts:
+        raise ValueError(u"No coordinate given")
+    return tuple(int(part) for part in parts)
+
 # serves as a "Main" class and controls user interface with model and view
 class TextGameController():
     def __init__(self):
@@ -312,7 +323,7 @@ class TextGameController():
         coord = None
         while True:
             try:
-                raw_in = eval(u"(" + raw_input(prompt) + u")")
+                raw_in = parseMove(raw_input(prompt))
                 coord = self.board.XYCoordToCoord(raw_in)
                 print coord
             except Exception, e:
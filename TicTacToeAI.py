@@ -0,0 +1,630 @@
+# Computer players for N-Dimensional Tic-Tac-Toe
+
+import math, multiprocessing, random, time
+from TicTacToe import getSymmetries
+
+# score of a won game, less the number of plies needed to reach it
+WIN = 10 ** 12
+
+# raised inside a search when its time budget runs out
+class SearchTimeout(Exception):
+    pass
+
+# kinds of values kept in a transposition table entry
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# a bounded table of searched positions, with a fixed number of slots indexed by the low
+# bits of the position hash. A slot is overwritten when the new entry was searched at
+# least as deep as the old one, or the old one was stored during an earlier search
+class TranspositionTable:
+    def __init__(self, slots=1 << 18):
+        # round up to a power of two so a slot is found with a mask
+        self.mask = (1 << max(slots-1, 1).bit_length()) - 1
+        self.slots = [None] * (self.mask+1)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    # ages every entry so the coming search may replace them
+    def newSearch(self):
+        self.generation += 1
+
+    # returns the entry (key, owner, depth, value, flag, move, generation) stored for key
+    # and owner, or None
+    def probe(self, key, owner):
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key and entry[1] == owner:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, owner, depth, value, flag, move):
+        slot = key & self.mask
+        entry = self.slots[slot]
+        if entry is None or entry[0] == key or entry[6] != self.generation \
+                or depth >= entry[2]:
+            self.slots[slot] = (key, owner, depth, value, flag, move, self.generation)
+
+    def clear(self):
+        self.slots = [None] * (self.mask+1)
+
+# plays uniformly random legal moves
+class RandomPlayer:
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def chooseMove(self, model):
+        return self.random.choice(
+            [index for index, player in enumerate(model.board) if player == 0])
+
+# a scripted player that completes a line if it can, blocks the next player who could
+# complete one, and otherwise plays a random move on the most lines it could still win
+class GreedyPlayer:
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def chooseMove(self, model):
+        player = model.current_player
+        board = model.board
+        # a line's owner is the only player on it, or 0 if it is empty or shared
+        owners = []
+        filled = []
+        for line in model.lines:
+            owner = 0
+            pieces = 0
+            for index in line:
+                if board[index] != 0:
+                    pieces += 1
+                    if owner == 0:
+                        owner = board[index]
+                    elif owner != board[index]:
+                        owner = -1
+            owners.append(owner)
+            filled.append(pieces)
+        best = []
+        best_score = None
+        for index, cell in enumerate(board):
+            if cell != 0:
+                continue
+            score = 0
+            for line_id in model.cell_lines[index]:
+                owner = owners[line_id]
+                if owner == player or owner == 0:
+                    score += 1
+                    if filled[line_id] == model.size - 1:
+                        return index
+                elif owner > 0 and filled[line_id] == model.size - 1:
+                    # blocking the player who moves soonest matters most
+                    urgency = model.players - (owner-player) % model.players
+                    score += len(model.lines) * urgency
+            if best_score is None or score > best_score:
+                best = [index]
+                best_score = score
+            elif score == best_score:
+                best.append(index)
+        return self.random.choice(best)
+
+# alpha-beta search over a private copy of a model's position. Moves are made and unmade
+# on per-line counters, so positions are never copied. With more than two players the
+# search is paranoid: every other player is assumed to play against the one to move.
+# Depth deepens one ply at a time until time_limit seconds pass or max_depth is reached.
+# Searched positions go in a transposition table by Zobrist hash, and with symmetric the
+# hash is the canonical one, so positions equivalent under symmetry are searched once
+class AlphaBetaPlayer:
+    def __init__(self, time_limit=1.0, max_depth=None, breadth=None, table=None,
+            symmetric=False, book=None):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        # only the best `breadth` moves by threat are searched below the root
+        self.breadth = breadth
+        if table is None:
+            table = TranspositionTable()
+        self.table = table
+        self.symmetric = symmetric
+        # an OpeningBook answering for positions it holds, without searching
+        self.book = book
+        self.nodes = 0
+        self.depth = 0
+        self.value = None
+        self.elapsed = 0.0
+
+    # nodes searched per second during the last call to chooseMove
+    def getNodesPerSecond(self):
+        if self.elapsed == 0:
+            return 0.0
+        return self.nodes / self.elapsed
+
+    # returns the flat index the model's current player should play. value is set to
+    # the value of the move for the current player at the deepest finished depth
+    def chooseMove(self, model):
+        if model.game_over:
+            raise ValueError("The game is over")
+        self.nodes = 0
+        self.depth = 0
+        self.value = None
+        self.elapsed = 0.0
+        if self.book is not None:
+            move = self.book.getMove(model)
+            if move is not None:
+                return move
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        self.load(model)
+        self.table.newSearch()
+        moves = self.orderMoves(self.root)
+        best = moves[0]
+        max_depth = len(moves)
+        if self.max_depth is not None:
+            max_depth = min(max_depth, self.max_depth)
+        try:
+            for depth in range(1, max_depth+1):
+                value, best = self.searchRoot(depth, moves, best)
+                self.depth = depth
+                self.value = value
+                # stop once the result of the game is known
+                if abs(value) > WIN - len(self.board):
+                    break
+        except SearchTimeout:
+            pass
+        self.elapsed = time.perf_counter() - start
+        return best
+
+    # copies the model's position into the search state
+    def load(self, model):
+        self.size = model.size
+        self.players = model.players
+        self.root = model.current_player
+        self.lines = model.lines
+        self.cell_lines = model.cell_lines
+        self.weights = [0] + [4 ** k for k in range(1, self.size+1)]
+        self.board = [0 for i in range(len(model.board))]
+        self.counts = [[0] * (self.players+1) for line in self.lines]
+        self.filled = [0 for line in self.lines]
+        self.players_on = [0 for line in self.lines]
+        self.owner = [0 for line in self.lines]
+        self.live_lines = len(self.lines)
+        self.moves = 0
+        self.score = 0
+        self.keys = model.zobrist_keys
+        self.hash = 0
+        if self.symmetric:
+            self.symmetries, self.inverses = getSymmetries(model)
+            self.coords = [model.getCoordFromIndex(i) for i in range(len(self.board))]
+            self.symmetry_hashes = [0 for symmetry in self.symmetries]
+        for index, player in enumerate(model.board):
+            if player != 0:
+                self.make(index, int(player))
+
+    # returns the index symmetry s sends index to
+    def getImage(self, index, s):
+        offset, coefficients = self.symmetries[s]
+        for c, k in zip(self.coords[index], coefficients):
+            offset += c * k
+        return offset
+
+    # toggles player at index in the position hashes
+    def hashMove(self, index, player):
+        self.hash ^= self.keys[index][player]
+        if self.symmetric:
+            hashes = self.symmetry_hashes
+            for s in range(len(hashes)):
+                hashes[s] ^= self.keys[self.getImage(index, s)][player]
+
+    # returns (key, s) for the current position, where s is the symmetry taking the
+    # position to the one the key describes
+    def getPositionKey(self):
+        if not self.symmetric:
+            return self.hash, 0
+        key = min(self.symmetry_hashes)
+        return key, self.symmetry_hashes.index(key)
+
+    # the heuristic value of a line for the root player: lines held by a single player
+    # are worth more the fuller they are, and lines shared by players are worth nothing
+    def lineValue(self, line_id):
+        if self.players_on[line_id] != 1:
+            return 0
+        value = self.weights[self.filled[line_id]]
+        if self.owner[line_id] == self.root:
+            return value
+        return -value
+
+    # puts player at index and updates the line counters, returning whether player won
+    def make(self, index, player):
+        self.board[index] = player
+        self.moves += 1
+        self.hashMove(index, player)
+        won = False
+        for line_id in self.cell_lines[index]:
+            self.score -= self.lineValue(line_id)
+            counts = self.counts[line_id]
+            if counts[player] == 0:
+                self.players_on[line_id] += 1
+                if self.players_on[line_id] == 1:
+                    self.owner[line_id] = player
+                elif self.players_on[line_id] == 2:
+                    self.live_lines -= 1
+            counts[player] += 1
+            self.filled[line_id] += 1
+            if counts[player] == self.size:
+                won = True
+            self.score += self.lineValue(line_id)
+        return won
+
+    # takes back a move made by player at index
+    def unmake(self, index, player):
+        for line_id in self.cell_lines[index]:
+            self.score -= self.lineValue(line_id)
+            counts = self.counts[line_id]
+            counts[player] -= 1
+            self.filled[line_id] -= 1
+            if counts[player] == 0:
+                self.players_on[line_id] -= 1
+                if self.players_on[line_id] == 1:
+                    self.live_lines += 1
+                    for p in range(1, self.players+1):
+                        if counts[p] != 0:
+                            self.owner[line_id] = p
+            self.score += self.lineValue(line_id)
+        self.board[index] = 0
+        self.moves -= 1
+        self.hashMove(index, player)
+
+    # returns the empty indices, most threatening first. Completing a line comes first,
+    # then blocking one, then extending lines the player holds or could still take
+    def orderMoves(self, player):
+        weights = self.weights
+        near_full = self.size - 1
+        scored = []
+        for index, cell in enumerate(self.board):
+            if cell != 0:
+                continue
+            threat = 0
+            for line_id in self.cell_lines[index]:
+                players_on = self.players_on[line_id]
+                if players_on == 0:
+                    threat += 1
+                elif players_on == 1:
+                    filled = self.filled[line_id]
+                    if self.owner[line_id] == player:
+                        threat += 2 * weights[filled]
+                        if filled == near_full:
+                            threat += 2 * WIN
+                    else:
+                        threat += weights[filled]
+                        if filled == near_full:
+                            threat += WIN
+            scored.append((threat, index))
+        scored.sort(reverse=True)
+        return [index for threat, index in scored]
+
+    # searches every root move to depth, trying first first, and returns (value, move)
+    def searchRoot(self, depth, moves, first):
+        moves = [first] + [index for index in moves if index != first]
+        next_player = self.root % self.players + 1
+        alpha = -2 * WIN
+        best = first
+        for index in moves:
+            if self.make(index, self.root):
+                self.unmake(index, self.root)
+                return WIN - 1, index
+            value = self.search(depth-1, alpha, 2 * WIN, next_player, 2)
+            self.unmake(index, self.root)
+            if value > alpha:
+                alpha = value
+                best = index
+        return alpha, best
+
+    # returns the value of the position for the root player with player to move,
+    # searched depth plies further. ply counts the moves made since the root
+    def search(self, depth, alpha, beta, player, ply):
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if self.moves == len(self.board) or self.live_lines == 0:
+            return 0
+        if depth == 0:
+            return self.score
+        key, s = self.getPositionKey()
+        entry = self.table.probe(key, self.root)
+        table_move = None
+        if entry is not None:
+            if entry[2] >= depth:
+                value = self.fromTable(entry[3], ply)
+                if entry[4] == EXACT:
+                    return value
+                if entry[4] == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+            if entry[5] is not None:
+                table_move = entry[5]
+                if self.symmetric:
+                    table_move = self.getImage(table_move, self.inverses[s])
+        maximizing = player == self.root
+        next_player = player % self.players + 1
+        if depth == 1:
+            moves = [index for index, cell in enumerate(self.board) if cell == 0]
+        else:
+            moves = self.orderMoves(player)
+            if self.breadth is not None:
+                moves = moves[:self.breadth]
+        if table_move is not None:
+            moves = [table_move] + [index for index in moves if index != table_move]
+        alpha_start = alpha
+        beta_start = beta
+        best = -2 * WIN if maximizing else 2 * WIN
+        best_move = None
+        for index in moves:
+            if self.make(index, player):
+                self.unmake(index, player)
+                return WIN - ply if maximizing else ply - WIN
+            value = self.search(depth-1, alpha, beta, next_player, ply+1)
+            self.unmake(index, player)
+            if maximizing:
+                if value > best:
+                    best = value
+                    best_move = index
+                    alpha = max(alpha, value)
+            else:
+                if value < best:
+                    best = value
+                    best_move = index
+                    beta = min(beta, value)
+            if alpha >= beta:
+                break
+        if best <= alpha_start:
+            flag = UPPER_BOUND
+        elif best >= beta_start:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        if self.symmetric and best_move is not None:
+            best_move = self.getImage(best_move, s)
+        self.table.store(key, self.root, depth, self.toTable(best, ply), flag, best_move)
+        return best
+
+    # win scores count plies from the root, but the table keeps them counted from the
+    # position stored so they stay right when the position is reached at another ply
+    def toTable(self, value, ply):
+        if value > WIN // 2:
+            return value + ply
+        if value < -WIN // 2:
+            return value - ply
+        return value
+
+    def fromTable(self, value, ply):
+        if value > WIN // 2:
+            return value - ply
+        if value < -WIN // 2:
+            return value + ply
+        return value
+
+
+# a node of the Monte Carlo search tree, reached by player putting a piece at move.
+# wins counts playout results from that player's point of view, and winner is set on
+# nodes that end the game (0 for a tie)
+class Node:
+    def __init__(self, parent, move, player, untried):
+        self.parent = parent
+        self.move = move
+        self.player = player
+        self.untried = untried
+        self.children = []
+        self.visits = 0
+        self.wins = 0.0
+        self.winner = None
+
+    # returns the child with the best upper confidence bound
+    def select(self, exploration):
+        log_visits = math.log(self.visits)
+        best = None
+        best_bound = None
+        for child in self.children:
+            bound = child.wins / child.visits \
+                + exploration * math.sqrt(log_visits / child.visits)
+            if best is None or bound > best_bound:
+                best = child
+                best_bound = bound
+        return best
+
+# Monte Carlo tree search (UCT) with random playouts. Playouts make and unmake moves on
+# per-line piece counters, so a simulated move costs one counter update per line through
+# its cell. With biased, playouts favour cells on many lines. Each search runs for
+# `iterations` playouts or time_limit seconds, whichever ends first. With workers > 1,
+# every worker process grows its own tree from the root and the root statistics are
+# summed (root parallelization); call close() to stop the workers. Positions in the
+# OpeningBook book, if given, are answered from it without searching
+class MCTSPlayer:
+    def __init__(self, time_limit=1.0, iterations=None, exploration=1.4, biased=False,
+            workers=1, seed=None, book=None):
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.exploration = exploration
+        self.biased = biased
+        self.workers = workers
+        self.random = random.Random(seed)
+        self.book = book
+        self.pool = None
+        self.playouts = 0
+        self.elapsed = 0.0
+
+    # playouts run per second during the last call to chooseMove
+    def getPlayoutsPerSecond(self):
+        if self.elapsed == 0:
+            return 0.0
+        return self.playouts / self.elapsed
+
+    # returns the flat index the model's current player should play
+    def chooseMove(self, model):
+        if model.game_over:
+            raise ValueError("The game is over")
+        if self.book is not None:
+            move = self.book.getMove(model)
+            if move is not None:
+                self.playouts = 0
+                self.elapsed = 0.0
+                return move
+        start = time.perf_counter()
+        if self.workers > 1:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+            jobs = []
+            for worker in range(self.workers):
+                seed = self.random.getrandbits(64)
+                jobs.append((model, self.time_limit, self.iterations, self.exploration,
+                    self.biased, seed))
+            stats = dict()
+            self.playouts = 0
+            for worker_stats, playouts in self.pool.map(_searchRoot, jobs):
+                self.playouts += playouts
+                for move, (visits, wins) in worker_stats.items():
+                    total_visits, total_wins = stats.get(move, (0, 0.0))
+                    stats[move] = (total_visits + visits, total_wins + wins)
+        else:
+            stats = self.getRootStats(model)
+        self.elapsed = time.perf_counter() - start
+        # with iterations=0 no move has been tried, so any empty cell will do
+        if not stats:
+            return self.random.choice([index for index, player in enumerate(model.board)
+                if player == 0])
+        return max(stats, key=lambda move: stats[move][0])
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    # searches from the model's position and returns a dict mapping each root move to
+    # (visits, wins). At least one playout runs however short the time limit
+    def getRootStats(self, model):
+        deadline = time.perf_counter() + self.time_limit
+        self.load(model)
+        previous = (model.current_player - 2) % self.players + 1
+        root = Node(None, None, previous, self.getEmpty())
+        self.playouts = 0
+        while self.iterations is None or self.playouts < self.iterations:
+            if (self.playouts & 63 == 0 and self.playouts > 0 and
+                    time.perf_counter() > deadline):
+                break
+            self.runPlayout(root)
+            self.playouts += 1
+        return dict((child.move, (child.visits, child.wins)) for child in root.children)
+
+    # copies the model's position into the search state
+    def load(self, model):
+        self.size = model.size
+        self.players = model.players
+        self.cell_lines = model.cell_lines
+        self.board = [int(player) for player in model.board]
+        self.counts = [[0] * (self.players+1) for line in model.lines]
+        for index, player in enumerate(self.board):
+            if player != 0:
+                for line_id in self.cell_lines[index]:
+                    self.counts[line_id][player] += 1
+        self.weights = [len(line_ids) for line_ids in self.cell_lines]
+
+    def getEmpty(self):
+        return [index for index, player in enumerate(self.board) if player == 0]
+
+    # puts player at index, returning whether player won
+    def make(self, index, player):
+        self.board[index] = player
+        won = False
+        for line_id in self.cell_lines[index]:
+            counts = self.counts[line_id]
+            counts[player] += 1
+            if counts[player] == self.size:
+                won = True
+        return won
+
+    def unmake(self, index, player):
+        self.board[index] = 0
+        for line_id in self.cell_lines[index]:
+            self.counts[line_id][player] -= 1
+
+    # selects a path down the tree, expands one node, plays the game out at random and
+    # credits the result to every node on the path
+    def runPlayout(self, root):
+        node = root
+        path = [root]
+        while not node.untried and node.children and node.winner is None:
+            node = node.select(self.exploration)
+            self.make(node.move, node.player)
+            path.append(node)
+        if node.winner is None and node.untried:
+            move = node.untried.pop(self.random.randrange(len(node.untried)))
+            player = node.player % self.players + 1
+            child = Node(node, move, player, None)
+            if self.make(move, player):
+                child.winner = player
+                child.untried = []
+            else:
+                child.untried = self.getEmpty()
+                if not child.untried:
+                    child.winner = 0
+            node.children.append(child)
+            node = child
+            path.append(node)
+        if node.winner is None:
+            winner = self.playOut(node.player % self.players + 1)
+        else:
+            winner = node.winner
+        for node in path:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner == 0:
+                node.wins += 1 / self.players
+        for node in path[:0:-1]:
+            self.unmake(node.move, node.player)
+
+    # plays random moves until the game ends, leaving the board as it was, and returns
+    # the winner or 0 for a tie
+    def playOut(self, player):
+        empty = self.getEmpty()
+        if self.biased:
+            # weighted random order: sort by u^(1/w) for uniform u
+            rng = self.random.random
+            weights = self.weights
+            empty.sort(key=lambda index: rng() ** (1 / weights[index]), reverse=True)
+        else:
+            self.random.shuffle(empty)
+        winner = 0
+        played = 0
+        for index in empty:
+            played += 1
+            if self.make(index, player):
+                winner = player
+                break
+            player = player % self.players + 1
+        for index in empty[:played]:
+            self.unmake(index, self.board[index])
+        return winner
+
+# runs one worker's share of a parallel MCTSPlayer search
+def _searchRoot(job):
+    model, time_limit, iterations, exploration, biased, seed = job
+    player = MCTSPlayer(time_limit, iterations, exploration, biased, 1, seed)
+    stats = player.getRootStats(model)
+    return stats, player.playouts
+
+# names of the kinds of computer players, for choosing them from the command line
+PLAYER_KINDS = ("random", "greedy", "alphabeta", "mcts")
+
+# returns a computer player of the given kind
+def createPlayer(kind, seed, think):
+    if kind == "random":
+        return RandomPlayer(seed)
+    if kind == "greedy":
+        return GreedyPlayer(seed)
+    if kind == "alphabeta":
+        return AlphaBetaPlayer(time_limit=think)
+    if kind == "mcts":
+        return MCTSPlayer(time_limit=think, seed=seed)
+    raise ValueError("Unknown player kind " + kind)
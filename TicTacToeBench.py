@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# Benchmarks for the hot paths of N-Dimensional Tic-Tac-Toe
+#
+# Every benchmark runs over a grid of dimensions, sizes and player counts and reports
+# operations per second and the peak memory allocated by one batch of operations.
+# Results can be saved as JSON and compared against a previous run
+
+import argparse, json, os, platform, random, subprocess, sys, time, tracemalloc
+import TicTacToe
+from TicTacToe import BitboardModel, Model, PlainTextView
+
+# the benchmarks below each take (dimensions, size, players, rng) and return a function
+# running one batch of operations and returning how many it ran
+
+def benchLineIndex(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    def run():
+        del TicTacToe._line_indices[(model.dimensions, model.size)]
+        TicTacToe.getLineIndex(model)
+        return 1
+    return run
+
+def benchSequences(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    coords = [model.getCoordFromIndex(rng.randrange(len(model.board))) for i in range(20)]
+    def run():
+        for coord in coords:
+            model.getSequencesFromCoord(coord)
+        return len(coords)
+    return run
+
+def benchIndexFromCoord(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    coords = [model.getCoordFromIndex(rng.randrange(len(model.board))) for i in range(1000)]
+    def run():
+        for coord in coords:
+            model.getIndexFromCoord(coord)
+        return len(coords)
+    return run
+
+def benchCoordFromIndex(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    indices = [rng.randrange(len(model.board)) for i in range(1000)]
+    def run():
+        for index in indices:
+            model.getCoordFromIndex(index)
+        return len(indices)
+    return run
+
+# one operation is one coordinate, converted to an index and back as a batch
+def benchBatchConversion(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    indices = [rng.randrange(len(model.board)) for i in range(1000)]
+    def run():
+        model.getIndicesFromCoords(model.getCoordsFromIndices(indices))
+        return len(indices)
+    return run
+
+# one operation is one move, replaying a random game and taking it back
+def benchPlayAtIndex(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    order = list(range(len(model.board)))
+    rng.shuffle(order)
+    def run():
+        played = 0
+        for index in order:
+            model.playAtIndex(index)
+            played += 1
+            if model.game_over:
+                break
+            model.nextTurn()
+        for i in range(played):
+            model.undo()
+        return played
+    return run
+
+# the same replay on a BitboardModel, which makes and unmakes moves on its masks
+def benchBitboardPlayAtIndex(dimensions, size, players, rng):
+    model = BitboardModel(dimensions, size, players)
+    order = list(range(len(model.board)))
+    rng.shuffle(order)
+    def run():
+        played = 0
+        for index in order:
+            model.playAtIndex(index)
+            played += 1
+            if model.game_over:
+                break
+            model.nextTurn()
+        for i in range(played):
+            model.undo()
+        return played
+    return run
+
+# views share layouts by board shape, so the layout cache is emptied before each create
+def benchViewCreate(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    view = PlainTextView(model)
+    def run():
+        TicTacToe._view_layouts.clear()
+        view.create()
+        return 1
+    return run
+
+def benchViewUpdate(dimensions, size, players, rng):
+    model = Model(dimensions, size, players)
+    view = PlainTextView(model)
+    indices = [rng.randrange(len(model.board)) for i in range(100)]
+    def run():
+        for index in indices:
+            view.update(index)
+        return len(indices)
+    return run
+
+# one operation is a whole game between random players on a fresh model and view
+def benchRandomGame(dimensions, size, players, rng):
+    def run():
+        model = Model(dimensions, size, players)
+        view = PlainTextView(model)
+        empty = list(range(len(model.board)))
+        rng.shuffle(empty)
+        for index in empty:
+            model.playAtIndex(index)
+            view.update(index)
+            if model.game_over:
+                break
+            model.nextTurn()
+        return 1
+    return run
+
+BENCHMARKS = (
+    ("getLineIndex", benchLineIndex),
+    ("getSequencesFromCoord", benchSequences),
+    ("getIndexFromCoord", benchIndexFromCoord),
+    ("getCoordFromIndex", benchCoordFromIndex),
+    ("batchConversion", benchBatchConversion),
+    ("playAtIndex", benchPlayAtIndex),
+    ("BitboardModel.playAtIndex", benchBitboardPlayAtIndex),
+    ("PlainTextView.create", benchViewCreate),
+    ("PlainTextView.update", benchViewUpdate),
+    ("randomGame", benchRandomGame),
+)
+
+# runs batches until min_time seconds pass and returns operations per second
+def measureSpeed(run, min_time):
+    ops = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        ops += run()
+        elapsed = time.perf_counter() - start
+    return ops / elapsed
+
+# returns the peak number of bytes allocated while running one batch
+def measureMemory(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# parses a comma separated list of integers and inclusive ranges such as 2-4,6
+def parseRange(text):
+    values = []
+    for part in text.split(","):
+        if "-" in part:
+            low, high = part.split("-")
+            values.extend(range(int(low), int(high)+1))
+        else:
+            values.append(int(part))
+    return values
+
+# returns the commit of the checkout holding this file, if it is a git checkout
+def getCommit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL,
+            universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# runs the selected benchmarks over the grid and returns the results
+def runBenchmarks(names, dimensions, sizes, players, min_time, seed, report):
+    results = []
+    for name, benchmark in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for d in dimensions:
+            for size in sizes:
+                for p in players:
+                    run = benchmark(d, size, p, random.Random(seed))
+                    memory = measureMemory(run)
+                    speed = measureSpeed(run, min_time)
+                    results.append({"benchmark": name, "dimensions": d, "size": size,
+                        "players": p, "ops_per_sec": speed, "peak_bytes": memory})
+                    report.write("{0:<28}{1}^{2} p{3}  {4:>14.1f} ops/s  {5:>12} bytes\n"
+                        .format(name, size, d, p, speed, memory))
+                    report.flush()
+    return results
+
+# prints the change in speed from a previous run for every benchmark in both
+def compare(results, previous, report):
+    old = dict()
+    for result in previous["results"]:
+        old[(result["benchmark"], result["dimensions"], result["size"],
+            result["players"])] = result
+    report.write("\ncompared with {0}\n".format(previous.get("commit")))
+    for result in results:
+        key = (result["benchmark"], result["dimensions"], result["size"], result["players"])
+        if key in old:
+            ratio = result["ops_per_sec"] / old[key]["ops_per_sec"]
+            report.write("{0:<28}{1}^{2} p{3}  {4:>7.2f}x speed  {5:>7.2f}x memory\n".format(
+                key[0], key[2], key[1], key[3], ratio,
+                result["peak_bytes"] / max(old[key]["peak_bytes"], 1)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths.")
+    parser.add_argument("-b", "--benchmark", action="append",
+        choices=[name for name, benchmark in BENCHMARKS],
+        help="benchmark to run, repeatable (default all)")
+    parser.add_argument("-d", "--dimensions", type=parseRange, default=parseRange("2-7"),
+        help="dimensions to run, such as 2-7")
+    parser.add_argument("-s", "--sizes", type=parseRange, default=[3], help="board sizes")
+    parser.add_argument("-p", "--players", type=parseRange, default=[2], help="player counts")
+    parser.add_argument("-t", "--min-time", type=float, default=0.2,
+        help="seconds to run each benchmark for")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="file to save the results to as JSON")
+    parser.add_argument("-c", "--compare", help="JSON results of a previous run to compare to")
+    args = parser.parse_args(argv)
+    results = runBenchmarks(args.benchmark, args.dimensions, args.sizes, args.players,
+        args.min_time, args.seed, sys.stdout)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"commit": getCommit(), "python": platform.python_version(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results},
+                output, indent=1)
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous), sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Opening books for N-Dimensional Tic-Tac-Toe
+#
+# A book holds the searched best move of every position reachable in the first few
+# plies from the empty board, keeping one canonical position per class of positions
+# equivalent under symmetry. Books are position stores (see TicTacToeIO) named after the
+# board shape, so the dimensions, size and players of a model select its book. Moves are
+# stored on the canonical board and mapped back onto the model's board when looked up
+
+import argparse, os, sys, time
+from TicTacToe import BitboardModel, Model, getSymmetries
+from TicTacToeAI import AlphaBetaPlayer
+from TicTacToeIO import PositionStore, writePositionStore
+from TicTacToeSelfPlay import parseConfig
+
+BOOK_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "books")
+
+# returns the path of the book for a board shape
+def getBookPath(dimensions, size, players, directory=BOOK_DIRECTORY):
+    return os.path.join(directory, "{0}_{1}_{2}.book".format(dimensions, size, players))
+
+# returns (hash, s) where hash is the model's canonical hash and s a symmetry sending
+# the board to the canonical board
+def getCanonicalKey(model):
+    hashes = model.getSymmetryHashes()
+    key = min(hashes)
+    return key, hashes.index(key)
+
+# searches every canonical position of the first depth plies for think seconds each and
+# returns the book entries, writing progress to report if given
+def buildBook(dimensions, size, players, depth, think, report=None):
+    searcher = AlphaBetaPlayer(time_limit=think, symmetric=True)
+    root = BitboardModel(dimensions, size, players, track_lines=True, track_symmetries=True)
+    entries = []
+    seen = set([getCanonicalKey(root)[0]])
+    frontier = [root]
+    for ply in range(depth):
+        start = time.perf_counter()
+        next_frontier = []
+        for model in frontier:
+            key, s = getCanonicalKey(model)
+            move = searcher.chooseMove(model)
+            # a search stopped before finishing depth 1 has no value
+            value = searcher.value if searcher.value is not None else 0
+            entries.append((key, value, model.getSymmetricIndex(move, s), searcher.depth))
+            if ply+1 == depth:
+                continue
+            for index in range(len(model.board)):
+                if model.board[index] != 0:
+                    continue
+                child = model.copy()
+                child.playAtIndex(index)
+                if child.game_over:
+                    continue
+                child.nextTurn()
+                child_key = getCanonicalKey(child)[0]
+                if child_key not in seen:
+                    seen.add(child_key)
+                    next_frontier.append(child)
+        if report is not None:
+            report.write("{0}:{1}:{2} ply {3}: {4} positions in {5:.2f}s\n".format(
+                dimensions, size, players, ply, len(frontier), time.perf_counter() - start))
+            report.flush()
+        frontier = next_frontier
+    return entries
+
+# looks moves up in the books of a directory. A book is opened the first time a model of
+# its shape asks for a move, and since opening only maps the file, books cost nothing at
+# startup. Once a position is missing from a book, later positions are not looked up
+class OpeningBook:
+
+    def __init__(self, directory=BOOK_DIRECTORY):
+        self.directory = directory
+        # (dimensions, size, players) -> PositionStore, or None without a book
+        self.stores = dict()
+        # (dimensions, size, players) -> moves played when a position was first missing
+        self.limits = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # returns the book for the model's shape, or None if there is none
+    def getStore(self, model):
+        shape = (model.dimensions, model.size, model.players)
+        if shape not in self.stores:
+            path = getBookPath(*shape, directory=self.directory)
+            self.stores[shape] = PositionStore(path) if os.path.exists(path) else None
+        return self.stores[shape]
+
+    # returns the book's move for the model's position, or None if it is not in the book
+    def getMove(self, model):
+        store = self.getStore(model)
+        shape = (model.dimensions, model.size, model.players)
+        if store is None or model.moves >= self.limits.get(shape, len(model.board)):
+            return None
+        key, s = getCanonicalKey(model)
+        entry = store.find(key)
+        if entry is None or entry.move < 0:
+            self.limits[shape] = min(self.limits.get(shape, len(model.board)), model.moves)
+            return None
+        move = model.getSymmetricIndex(entry.move, getSymmetries(model)[1][s])
+        if model.board[move] != 0:
+            return None
+        return move
+
+    def close(self):
+        for store in self.stores.values():
+            if store is not None:
+                store.close()
+        self.stores.clear()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build opening books.")
+    parser.add_argument("configs", nargs="+", type=parseConfig,
+        help="board configurations as dimensions:size[:players]")
+    parser.add_argument("-d", "--depth", type=int, default=2,
+        help="plies from the empty board to cover")
+    parser.add_argument("-t", "--think", type=float, default=1.0,
+        help="seconds to search each position")
+    parser.add_argument("-o", "--directory", default=BOOK_DIRECTORY,
+        help="directory to write the books to")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.directory):
+        os.makedirs(args.directory)
+    for dimensions, size, players in args.configs:
+        # the model settles sizes and player counts it does not accept
+        model = Model(dimensions, size, players)
+        dimensions, size, players = model.dimensions, model.size, model.players
+        entries = buildBook(dimensions, size, players, args.depth, args.think, sys.stdout)
+        path = getBookPath(dimensions, size, players, args.directory)
+        writePositionStore(path, dimensions, size, players, entries)
+        print("{0}: {1} positions".format(path, len(entries)))
+
+if __name__ == "__main__":
+    main()
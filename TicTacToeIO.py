@@ -0,0 +1,434 @@
+# Game records for N-Dimensional Tic-Tac-Toe
+#
+# A record file starts with the magic bytes TTTG and a format version, followed by any
+# number of game records. Every record is a sequence of unsigned LEB128 varints:
+# dimensions, size, players, winner (0 for a tie or an unfinished game), the number of
+# moves and then the flat index of every move in order. Boards of up to 128 cells take a
+# single byte per move
+#
+# Single positions are packed with players.bit_length() bits per cell, and sets of
+# evaluated positions are kept in position stores, files of fixed size entries sorted by
+# canonical hash that are memory mapped and searched in place
+
+import array, collections, mmap, os, struct
+from TicTacToe import Model
+
+MAGIC = b"TTTG"
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION])
+
+# bytes read from a stream at a time by readGames
+CHUNK_SIZE = 1 << 16
+
+GameRecord = collections.namedtuple("GameRecord",
+    ("dimensions", "size", "players", "winner", "moves"))
+
+POSITION_STORE_MAGIC = b"TTTP"
+POSITION_STORE_VERSION = 1
+# magic, version, dimensions, size, players and number of entries
+POSITION_STORE_HEADER = struct.Struct("<4sBBBBQ")
+# canonical hash, value, move (-1 for none) and search depth
+POSITION_STORE_ENTRY = struct.Struct("<Qqii")
+
+PositionEntry = collections.namedtuple("PositionEntry", ("hash", "value", "move", "depth"))
+
+# appends value to data as an unsigned LEB128 varint
+def encodeVarint(value, data):
+    if value < 0:
+        raise ValueError("Varints must not be negative")
+    while value > 0x7f:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+
+# returns (value, position after it) for the varint at position in data. Raises
+# IndexError if data ends inside the varint
+def decodeVarint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+# returns the bytes of one game record
+def encodeRecord(dimensions, size, players, winner, moves):
+    data = bytearray()
+    for value in (dimensions, size, players, winner, len(moves)):
+        encodeVarint(value, data)
+    for index in moves:
+        encodeVarint(index, data)
+    return data
+
+# returns (record, position after it) for the game record at position in data. Raises
+# IndexError if data ends inside the record
+def decodeRecord(data, position):
+    values = []
+    for i in range(5):
+        value, position = decodeVarint(data, position)
+        values.append(value)
+    moves = []
+    for i in range(values[4]):
+        index, position = decodeVarint(data, position)
+        moves.append(index)
+    return GameRecord(values[0], values[1], values[2], values[3], moves), position
+
+# returns the position after the game record at position in data without decoding its
+# moves. Raises IndexError if data ends inside the record
+def skipRecord(data, position):
+    for i in range(4):
+        value, position = decodeVarint(data, position)
+    count, position = decodeVarint(data, position)
+    while count > 0:
+        if data[position] < 0x80:
+            count -= 1
+        position += 1
+    return position
+
+# returns the record of the game played on model so far
+def recordFromModel(model):
+    winner = 0
+    if model.game_over and not model.tied_game:
+        winner = model.current_player
+    moves = [entry[0] for entry in model.move_stack]
+    return GameRecord(model.dimensions, model.size, model.players, winner, moves)
+
+# returns a model of the record's board with its moves replayed
+def replayRecord(record, model_class=Model, **options):
+    model = model_class(record.dimensions, record.size, record.players, **options)
+    for index in record.moves:
+        if model.game_over:
+            raise ValueError("Move after the end of the game")
+        model.playAtIndex(index)
+        if not model.game_over:
+            model.nextTurn()
+    return model
+
+# returns the number of bits packBoard uses for a cell, enough for 0 to players
+def getCellBits(players):
+    return players.bit_length()
+
+# returns board packed into bytes with getCellBits(players) bits per cell, cell 0 in the
+# lowest bits of the first byte
+def packBoard(board, players):
+    bits = getCellBits(players)
+    value = 0
+    for player in reversed(board):
+        value = value << bits | int(player)
+    return value.to_bytes((len(board) * bits + 7) // 8, "little")
+
+# returns the list of cells packed into data by packBoard
+def unpackBoard(data, cells, players):
+    bits = getCellBits(players)
+    value = int.from_bytes(data, "little")
+    mask = (1 << bits) - 1
+    board = []
+    for i in range(cells):
+        board.append(value & mask)
+        value >>= bits
+    return board
+
+# returns the model's position as bytes: varints for dimensions, size, players, the
+# current player and the game over and tied flags, then the packed board
+def packPosition(model):
+    data = bytearray()
+    flags = int(model.game_over) | int(model.tied_game) << 1
+    for value in (model.dimensions, model.size, model.players, model.current_player, flags):
+        encodeVarint(value, data)
+    data += packBoard(model.board, model.players)
+    return bytes(data)
+
+# returns a model in the position packed into data by packPosition. Hashes and line
+# counters are rebuilt from the board, but the moves leading to it are not known, so
+# they cannot be undone
+def unpackPosition(data, model_class=Model, **options):
+    values = []
+    position = 0
+    for i in range(5):
+        value, position = decodeVarint(data, position)
+        values.append(value)
+    dimensions, size, players, current_player, flags = values
+    model = model_class(dimensions, size, players, **options)
+    board = unpackBoard(data[position:], len(model.board), model.players)
+    for index, player in enumerate(board):
+        if player > model.players:
+            raise ValueError("Invalid player at index " + str(index))
+        if player != 0:
+            model.setCell(index, player)
+            if model.track_lines:
+                model.addLineCounts(index, player)
+            model.moves += 1
+    model.current_player = current_player
+    model.game_over = bool(flags & 1)
+    model.tied_game = bool(flags & 2)
+    return model
+
+# writes game records to a binary stream, starting with the file header. Records are
+# buffered and written in blocks of about CHUNK_SIZE bytes
+class GameWriter:
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = bytearray(HEADER)
+        self.games = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def write(self, dimensions, size, players, winner, moves):
+        for value in (dimensions, size, players, winner, len(moves)):
+            encodeVarint(value, self.buffer)
+        for index in moves:
+            encodeVarint(index, self.buffer)
+        self.games += 1
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def writeRecord(self, record):
+        self.write(record.dimensions, record.size, record.players, record.winner,
+            record.moves)
+
+    def writeModel(self, model):
+        self.writeRecord(recordFromModel(model))
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write(self.buffer)
+            self.buffer = bytearray()
+        self.stream.flush()
+
+# checks the file header at the start of data and returns the position after it
+def readHeader(data):
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a game record file")
+    if len(data) < len(HEADER) or data[len(MAGIC)] != VERSION:
+        raise ValueError("Unsupported game record version")
+    return len(HEADER)
+
+# yields every game record in a binary stream, reading it in blocks so files of any size
+# can be replayed in constant memory
+def readGames(stream):
+    data = stream.read(len(HEADER))
+    position = readHeader(data)
+    data = b""
+    position = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if chunk:
+            data = data[position:] + chunk
+            position = 0
+        elif position == len(data):
+            return
+        while position < len(data):
+            try:
+                record, end = decodeRecord(data, position)
+            except IndexError:
+                if not chunk:
+                    raise ValueError("Truncated game record")
+                break
+            yield record
+            position = end
+
+# random access to the records of a game record file. The file is memory mapped, and the
+# offset of every record is saved next to it as path.idx, an array of 64 bit integers that
+# is memory mapped too while it is newer than the file
+class GameIndex:
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = b""
+        self.index_map = None
+        try:
+            if os.fstat(self.file.fileno()).st_size:
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.start = readHeader(self.data)
+            if not self.loadOffsets():
+                self.offsets = self.buildOffsets()
+                self.saveOffsets()
+        except:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, game):
+        return decodeRecord(self.data, self.offsets[game])[0]
+
+    def __iter__(self):
+        for offset in self.offsets:
+            yield decodeRecord(self.data, offset)[0]
+
+    def getIndexPath(self):
+        return self.path + ".idx"
+
+    # returns the offsets of every record, found by skipping through the file
+    def buildOffsets(self):
+        offsets = array.array("Q")
+        position = self.start
+        while position < len(self.data):
+            offsets.append(position)
+            try:
+                position = skipRecord(self.data, position)
+            except IndexError:
+                raise ValueError("Truncated game record")
+        return offsets
+
+    # maps a saved index if there is one for the current file and returns whether it did
+    def loadOffsets(self):
+        index_path = self.getIndexPath()
+        try:
+            if os.path.getmtime(index_path) < os.path.getmtime(self.path):
+                return False
+            with open(index_path, "rb") as index_file:
+                if os.fstat(index_file.fileno()).st_size == 0:
+                    self.offsets = array.array("Q")
+                else:
+                    self.index_map = mmap.mmap(index_file.fileno(), 0,
+                        access=mmap.ACCESS_READ)
+                    self.offsets = memoryview(self.index_map).cast("Q")
+        except (OSError, TypeError, ValueError):
+            self.releaseOffsets()
+            return False
+        # an index from before the file was rewritten no longer matches it
+        if len(self.offsets) == 0 and len(self.data) > self.start or (len(self.offsets) > 0
+                and self.offsets[-1] >= len(self.data)):
+            self.releaseOffsets()
+            return False
+        return True
+
+    def saveOffsets(self):
+        try:
+            with open(self.getIndexPath(), "wb") as index_file:
+                self.offsets.tofile(index_file)
+        except OSError:
+            pass
+
+    def releaseOffsets(self):
+        if isinstance(getattr(self, "offsets", None), memoryview):
+            self.offsets.release()
+        self.offsets = array.array("Q")
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+
+    def close(self):
+        self.releaseOffsets()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+# writes a position store of the given board shape to path. entries holds (hash, value,
+# move, depth) for every position, keyed by canonical hash with the move given on the
+# canonical board. When a hash appears more than once the deepest entry is kept
+def writePositionStore(path, dimensions, size, players, entries):
+    best = dict()
+    for entry in entries:
+        entry = PositionEntry(*entry)
+        if entry.hash not in best or entry.depth > best[entry.hash].depth:
+            best[entry.hash] = entry
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as store:
+        store.write(POSITION_STORE_HEADER.pack(POSITION_STORE_MAGIC,
+            POSITION_STORE_VERSION, dimensions, size, players, len(best)))
+        data = bytearray()
+        for key in sorted(best):
+            data += POSITION_STORE_ENTRY.pack(*best[key])
+            if len(data) >= CHUNK_SIZE:
+                store.write(data)
+                data = bytearray()
+        store.write(data)
+    os.replace(temp_path, path)
+
+# a position store opened for lookups. Only the header is read when it is opened, and
+# lookups binary search the memory mapped entries, so even large stores open instantly
+class PositionStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = b""
+        try:
+            if os.fstat(self.file.fileno()).st_size:
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self.data) < POSITION_STORE_HEADER.size:
+                raise ValueError("Not a position store")
+            magic, version, self.dimensions, self.size, self.players, self.count = \
+                POSITION_STORE_HEADER.unpack_from(self.data, 0)
+            if magic != POSITION_STORE_MAGIC:
+                raise ValueError("Not a position store")
+            if version != POSITION_STORE_VERSION:
+                raise ValueError("Unsupported position store version")
+            if len(self.data) != (POSITION_STORE_HEADER.size +
+                    self.count * POSITION_STORE_ENTRY.size):
+                raise ValueError("Truncated position store")
+        except:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.getEntry(i)
+
+    # returns whether positions of the model's board shape are stored here
+    def matches(self, model):
+        return (self.dimensions, self.size, self.players) == \
+            (model.dimensions, model.size, model.players)
+
+    # returns entry number i in hash order
+    def getEntry(self, i):
+        offset = POSITION_STORE_HEADER.size + i * POSITION_STORE_ENTRY.size
+        return PositionEntry(*POSITION_STORE_ENTRY.unpack_from(self.data, offset))
+
+    # returns the entry of a canonical hash, or None if it is not stored
+    def find(self, key):
+        low = 0
+        high = self.count
+        unpack_from = struct.Struct("<Q").unpack_from
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = unpack_from(self.data, POSITION_STORE_HEADER.size +
+                middle * POSITION_STORE_ENTRY.size)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return self.getEntry(middle)
+        return None
+
+    # returns the entry of the model's position, or None if it is not stored
+    def findModel(self, model):
+        if not self.matches(model):
+            return None
+        return self.find(model.getCanonicalHash())
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
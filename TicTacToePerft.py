@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# Move generation and win detection checks for N-Dimensional Tic-Tac-Toe
+#
+# perft walks every sequence of moves to a given depth from a position and counts the
+# moves made, the positions reached at that depth and the games ended along the way by
+# a win or a tie. Backends that find wins differently must agree on every count, so
+# running two of them over the same position checks one against the other, and timing
+# the walk measures their speed. The winning lines of the shared line index are also
+# checked against getSequencesFromCoord cell by cell
+
+import argparse, sys, time
+from TicTacToe import BitboardModel, Model, NumpyModel, countLines, importNumpy
+from TicTacToeSelfPlay import parseConfig
+
+# finds wins from getSequencesFromCoord alone, the way Model did before the shared line
+# index, to check faster backends against
+class ReferenceModel(Model):
+    def isWinningMove(self, index, player):
+        for seq in self.getSequencesFromCoord(self.getCoordFromIndex(index)):
+            for coord in seq:
+                if self.board[self.getIndexFromCoord(coord)] != player:
+                    break
+            else:
+                return True
+        return False
+
+BACKENDS = {
+    "reference": ReferenceModel,
+    "model": Model,
+    "bitboard": BitboardModel,
+    "numpy": NumpyModel,
+}
+
+# counts of one perft walk. nodes is the number of moves made, leaves the number of
+# positions reached at full depth, and wins and ties the games ended on the way
+class PerftCounts:
+    def __init__(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.wins = 0
+        self.ties = 0
+
+    def add(self, other):
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.wins += other.wins
+        self.ties += other.ties
+
+    def getCounts(self):
+        return (self.nodes, self.leaves, self.wins, self.ties)
+
+    def __eq__(self, other):
+        return self.getCounts() == other.getCounts()
+
+    def __str__(self):
+        return "nodes {0} leaves {1} wins {2} ties {3}".format(*self.getCounts())
+
+# walks every sequence of depth moves from the model's position, adding to counts, and
+# leaves the model in the position it started in
+def perft(model, depth, counts):
+    if depth == 0:
+        counts.leaves += 1
+        return
+    for index in range(len(model.board)):
+        if model.board[index] != 0:
+            continue
+        counts.nodes += 1
+        model.playAtIndex(index)
+        if model.game_over:
+            if model.tied_game:
+                counts.ties += 1
+            else:
+                counts.wins += 1
+        else:
+            model.nextTurn()
+            perft(model, depth-1, counts)
+        model.unmake(index)
+
+# returns a dict mapping every move from the model's position to the counts of the walk
+# after it, to narrow down where two backends disagree
+def divide(model, depth):
+    results = dict()
+    for index in range(len(model.board)):
+        if model.board[index] != 0:
+            continue
+        counts = PerftCounts()
+        counts.nodes += 1
+        model.playAtIndex(index)
+        if model.game_over:
+            if model.tied_game:
+                counts.ties += 1
+            else:
+                counts.wins += 1
+        else:
+            model.nextTurn()
+            perft(model, depth-1, counts)
+        model.unmake(index)
+        results[index] = counts
+    return results
+
+# returns a model of the backend with moves played from the empty board
+def createPosition(backend, dimensions, size, players, moves):
+    model = BACKENDS[backend](dimensions, size, players)
+    for index in moves:
+        if model.game_over:
+            raise ValueError("Move after the end of the game")
+        model.playAtIndex(index)
+        if not model.game_over:
+            model.nextTurn()
+    return model
+
+# compares the model's line index with the lines getSequencesFromCoord finds through
+# every cell, and their number with countLines. Returns a list of problems found
+def checkLines(model):
+    problems = []
+    lines = set(model.lines)
+    if len(lines) != len(model.lines):
+        problems.append("line index holds a line more than once")
+    expected = countLines(model.dimensions, model.size)
+    if len(lines) != expected:
+        problems.append("{0} lines in the index, {1} expected".format(len(lines), expected))
+    reference = set()
+    for index in range(len(model.board)):
+        cell_lines = set()
+        for seq in model.getSequencesFromCoord(model.getCoordFromIndex(index)):
+            line = tuple(sorted(model.getIndexFromCoord(coord) for coord in seq))
+            if index not in line:
+                problems.append("sequence {0} of index {1} misses it".format(seq, index))
+            cell_lines.add(line)
+        reference |= cell_lines
+        indexed = set(model.getLinesFromIndex(index))
+        if indexed != cell_lines:
+            problems.append("index {0}: {1} missing and {2} extra lines".format(index,
+                len(cell_lines - indexed), len(indexed - cell_lines)))
+    if reference != lines:
+        problems.append("{0} lines missing from the index and {1} extra".format(
+            len(reference - lines), len(lines - reference)))
+    return problems
+
+# runs perft with every backend from the same position, writing counts and speed to
+# report, and returns whether they all agree
+def compareBackends(backends, dimensions, size, players, moves, depth, report,
+        show_divide=False):
+    first = None
+    first_divide = None
+    agree = True
+    for backend in backends:
+        model = createPosition(backend, dimensions, size, players, moves)
+        start = time.perf_counter()
+        if show_divide:
+            results = divide(model, depth)
+            counts = PerftCounts()
+            for index in sorted(results):
+                counts.add(results[index])
+        else:
+            counts = PerftCounts()
+            perft(model, depth, counts)
+        elapsed = time.perf_counter() - start
+        status = ""
+        if first is None:
+            first = counts
+            first_divide = results if show_divide else None
+        elif counts != first:
+            status = "  MISMATCH"
+            agree = False
+        report.write("{0:<10} {1}  {2:.2f}s  {3:.0f} nodes/s{4}\n".format(backend, counts,
+            elapsed, counts.nodes / max(elapsed, 1e-9), status))
+        # the first backend lists every move, and the others the moves they disagree on
+        if show_divide:
+            for index in sorted(results):
+                if results is first_divide:
+                    report.write("  move {0}: {1}\n".format(index, results[index]))
+                elif results[index] != first_divide[index]:
+                    report.write("  move {0}: {1}, {2} with {3}\n".format(index,
+                        results[index], first_divide[index], backends[0]))
+    return agree
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count and time positions reachable "
+        "to a depth, checking backends against each other.")
+    parser.add_argument("config", type=parseConfig,
+        help="board configuration as dimensions:size[:players]")
+    parser.add_argument("-d", "--depth", type=int, default=3, help="plies to walk")
+    parser.add_argument("-b", "--backend", action="append", choices=sorted(BACKENDS),
+        help="backend to run, repeatable, with the first as the reference "
+        "(default reference and bitboard)")
+    parser.add_argument("-m", "--moves", default="",
+        help="comma separated flat indices to play before walking")
+    parser.add_argument("--divide", action="store_true",
+        help="report counts after every first move")
+    parser.add_argument("--lines", action="store_true",
+        help="check the line index against getSequencesFromCoord")
+    args = parser.parse_args(argv)
+    backends = args.backend or ["reference", "bitboard"]
+    if "numpy" in backends and importNumpy() is None:
+        parser.error("the numpy backend needs numpy")
+    dimensions, size, players = args.config
+    moves = [int(i) for i in args.moves.split(",") if i.strip()]
+    ok = True
+    if args.lines:
+        model = Model(dimensions, size, players)
+        problems = checkLines(model)
+        for problem in problems:
+            print(problem)
+        print("{0} lines, {1}".format(len(model.lines), "MISMATCH" if problems else "ok"))
+        ok = not problems
+    ok = compareBackends(backends, dimensions, size, players, moves, args.depth,
+        sys.stdout, args.divide) and ok
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Headless self-play for N-Dimensional Tic-Tac-Toe
+#
+# Plays batches of games between computer players over a process pool and writes one
+# line per game: configuration, game number, winner (0 for a tie), length and the flat
+# indices of the moves. Every game is seeded from the base seed, its configuration and its
+# number, so results do not depend on the number of workers. Games can also be saved as
+# binary game records, see TicTacToeIO
+
+import argparse, multiprocessing, sys, time
+from TicTacToe import Model
+from TicTacToeAI import PLAYER_KINDS, createPlayer
+from TicTacToeIO import GameWriter
+
+# plays one game and returns (winner, moves), where winner is 0 for a tie
+def playGame(job):
+    dimensions, size, players, kinds, think, seed = job
+    model = Model(dimensions, size, players, track_lines=True)
+    computers = []
+    for p in range(model.players):
+        computers.append(createPlayer(kinds[p % len(kinds)], "{0}:{1}".format(seed, p), think))
+    moves = []
+    while not model.game_over:
+        index = computers[model.current_player-1].chooseMove(model)
+        model.playAtIndex(index)
+        moves.append(index)
+        if not model.game_over:
+            model.nextTurn()
+    if model.tied_game:
+        return 0, moves
+    return model.current_player, moves
+
+# parses a configuration written as dimensions:size[:players]
+def parseConfig(text):
+    values = [int(i) for i in text.split(":")]
+    if not 2 <= len(values) <= 3:
+        raise argparse.ArgumentTypeError("expected dimensions:size[:players]")
+    if len(values) == 2:
+        values.append(2)
+    return tuple(values)
+
+# plays games games of every configuration, writing a line per game to output and a
+# summary per configuration to report, and every game to the GameWriter record if given
+def run(configs, games, kinds, think, seed, workers, output, report, record=None):
+    pool = multiprocessing.Pool(workers)
+    try:
+        for dimensions, size, players in configs:
+            # the model settles sizes and player counts it does not accept
+            model = Model(dimensions, size, players)
+            dimensions, size, players = model.dimensions, model.size, model.players
+            name = "{0}:{1}:{2}".format(dimensions, size, players)
+            jobs = []
+            for game in range(games):
+                game_seed = "{0}:{1}:{2}".format(seed, name, game)
+                jobs.append((dimensions, size, players, kinds, think, game_seed))
+            wins = [0] * (players+1)
+            total_moves = 0
+            start = time.perf_counter()
+            results = pool.imap(playGame, jobs, max(1, games // (workers * 16)))
+            for game, (winner, moves) in enumerate(results):
+                wins[winner] += 1
+                total_moves += len(moves)
+                output.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(name, game, winner,
+                    len(moves), " ".join(str(i) for i in moves)))
+                if record is not None:
+                    record.write(dimensions, size, players, winner, moves)
+            elapsed = time.perf_counter() - start
+            summary = ["{0}: {1} games in {2:.2f}s, {3:.1f} games/s, {4:.1f} moves/game"
+                .format(name, games, elapsed, games / elapsed, total_moves / max(games, 1))]
+            for p in range(1, players+1):
+                summary.append("player {0} {1}".format(p, wins[p]))
+            summary.append("ties {0}".format(wins[0]))
+            report.write(", ".join(summary) + "\n")
+            report.flush()
+    finally:
+        pool.close()
+        pool.join()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play computer players against each other.")
+    parser.add_argument("configs", nargs="+", type=parseConfig,
+        help="board configurations as dimensions:size[:players]")
+    parser.add_argument("-n", "--games", type=int, default=100, help="games per configuration")
+    parser.add_argument("-p", "--players", default="random",
+        help="comma separated player kinds in turn order, from " + ", ".join(PLAYER_KINDS))
+    parser.add_argument("-t", "--think", type=float, default=0.05,
+        help="seconds per move for searching players")
+    parser.add_argument("-s", "--seed", default="0", help="base random seed")
+    parser.add_argument("-w", "--workers", type=int, default=multiprocessing.cpu_count(),
+        help="worker processes")
+    parser.add_argument("-o", "--output", default="-",
+        help="file for per-game results, - for standard output")
+    parser.add_argument("-r", "--record", help="file to save the games to as game records")
+    args = parser.parse_args(argv)
+    kinds = args.players.split(",")
+    for kind in kinds:
+        if kind not in PLAYER_KINDS:
+            parser.error("unknown player kind " + kind)
+    record_file = open(args.record, "wb") if args.record else None
+    record = GameWriter(record_file) if record_file else None
+    try:
+        if args.output == "-":
+            run(args.configs, args.games, kinds, args.think, args.seed, args.workers,
+                sys.stdout, sys.stderr, record)
+        else:
+            with open(args.output, "w") as output:
+                run(args.configs, args.games, kinds, args.think, args.seed, args.workers,
+                    output, sys.stdout, record)
+    finally:
+        if record_file:
+            record.flush()
+            record_file.close()
+
+if __name__ == "__main__":
+    main()
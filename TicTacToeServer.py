@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# Network play for N-Dimensional Tic-Tac-Toe
+#
+# An asyncio server hosting any number of rooms, each with its own Model. Clients connect
+# over TCP or a Unix socket and exchange JSON objects, one per line, each with a "type":
+#
+#   join   {"room", "dimensions", "size", "players"}  enters a room, creating it with the
+#          given board if it does not exist, and takes the first free seat. Clients
+#          arriving when every seat is taken watch as spectators
+#   move   {"coord"}  plays the model coordinate for the client's seat
+#   state  {}  asks for the state of the client's room
+#   leave  {}  leaves the room
+#
+# The server answers join with "joined", giving the client's player number (null for a
+# spectator) and the room's state, state with "state", and problems with "error" and a
+# message. Everyone in a room is sent "player_joined" and "player_left" as seats change
+# and "moved" after every move. Moves are only accepted once every seat is taken, from
+# the current player, and the room then passes the turn on with nextTurn. An idle
+# connection costs one waiting coroutine, so one process holds thousands of them.
+# RemoteGame lets CursesController play in a room from a terminal
+
+import argparse, asyncio, json, queue, threading
+from TicTacToe import CursesController, IllegalMoveError, Model
+
+# longest line a client may send
+MAX_LINE = 1 << 16
+# bytes waiting to be sent to a client before it is dropped as too slow
+MAX_BUFFER = 1 << 20
+# largest board a client may create
+MAX_CELLS = 1 << 12
+# seconds RemoteGame waits to connect and join a room
+JOIN_TIMEOUT = 10.0
+
+# a client connection, with the room and seat it holds
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.room = None
+        self.player = None
+
+    # queues a message without waiting, dropping the client if it stops reading
+    def send(self, message):
+        if self.writer.is_closing():
+            return
+        self.writer.write((json.dumps(message, separators=(",", ":")) + "\n").encode())
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            self.writer.close()
+
+# one game and the clients in it. seats maps player numbers to connections
+class Room:
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.seats = dict()
+        self.connections = set()
+        self.moves = []
+
+    def isFull(self):
+        return len(self.seats) == self.model.players
+
+    # returns the winner, 0 for a tie, or None while the game goes on
+    def getWinner(self):
+        model = self.model
+        if not model.game_over:
+            return None
+        if model.tied_game:
+            return 0
+        return model.current_player
+
+    def getState(self):
+        model = self.model
+        return {"room": self.name, "dimensions": model.dimensions, "size": model.size,
+            "players": model.players, "seats": sorted(self.seats), "moves": self.moves,
+            "current_player": model.current_player, "game_over": model.game_over,
+            "winner": self.getWinner()}
+
+    def broadcast(self, message):
+        for connection in self.connections:
+            connection.send(message)
+
+# returns message[key] if it is an integer, or default if it is missing
+def getInteger(message, key, default=None):
+    value = message.get(key, default)
+    if type(value) is not int:
+        raise ValueError(key + " must be an integer")
+    return value
+
+# returns whether a size^dimensions board holds more than MAX_CELLS cells. The product
+# grows one axis at a time, since the event loop must not compute a power of numbers a
+# client chose
+def isBoardTooLarge(dimensions, size):
+    cells = 1
+    for i in range(dimensions):
+        cells *= size
+        if cells > MAX_CELLS:
+            return True
+    return False
+
+class GameServer:
+    def __init__(self):
+        self.rooms = dict()
+        self.connections = 0
+
+    # serves one client until it disconnects
+    async def handle(self, reader, writer):
+        connection = Connection(writer)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    connection.send({"type": "error", "message": "Line too long"})
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    connection.send({"type": "error", "message": "Invalid JSON"})
+                    continue
+                self.dispatch(connection, message)
+        finally:
+            self.connections -= 1
+            self.leave(connection, None)
+            writer.close()
+
+    def dispatch(self, connection, message):
+        handlers = {"join": self.join, "move": self.move, "state": self.state,
+            "leave": self.leave}
+        if not isinstance(message, dict) or message.get("type") not in handlers:
+            connection.send({"type": "error", "message": "Unknown message"})
+            return
+        try:
+            handlers[message["type"]](connection, message)
+        except ValueError as e:
+            connection.send({"type": "error", "message": str(e)})
+
+    def join(self, connection, message):
+        name = message.get("room")
+        if not isinstance(name, str):
+            raise ValueError("room must be a string")
+        if name not in self.rooms:
+            dimensions = getInteger(message, "dimensions", 2)
+            size = getInteger(message, "size", 0)
+            players = getInteger(message, "players", 2)
+            if size < 3:
+                size = max(dimensions+1, 3)
+            if dimensions < 1 or isBoardTooLarge(dimensions, size):
+                raise ValueError("Board too large")
+            room = Room(name, Model(dimensions, size, players))
+        else:
+            room = self.rooms[name]
+        self.leave(connection, None)
+        self.rooms[name] = room
+        room.connections.add(connection)
+        connection.room = room
+        for player in range(1, room.model.players+1):
+            if player not in room.seats:
+                room.seats[player] = connection
+                connection.player = player
+                room.broadcast({"type": "player_joined", "player": player})
+                break
+        reply = {"type": "joined", "player": connection.player}
+        reply.update(room.getState())
+        connection.send(reply)
+
+    def move(self, connection, message):
+        room = connection.room
+        if room is None:
+            raise ValueError("Not in a room")
+        model = room.model
+        if model.game_over:
+            raise ValueError("The game is over")
+        if not room.isFull():
+            raise ValueError("Waiting for players")
+        if connection.player != model.current_player:
+            raise ValueError("Not your turn")
+        coord = message.get("coord")
+        if not isinstance(coord, list) or any(type(c) is not int for c in coord):
+            raise ValueError("coord must be a list of integers")
+        coord = tuple(coord)
+        model.validateCoord(coord)
+        index = model.getIndexFromCoord(coord)
+        try:
+            model.playAtIndex(index)
+        except IllegalMoveError as e:
+            raise ValueError(str(e))
+        room.moves.append(index)
+        player = model.current_player
+        if not model.game_over:
+            model.nextTurn()
+        room.broadcast({"type": "moved", "player": player, "coord": list(coord),
+            "index": index, "current_player": model.current_player,
+            "game_over": model.game_over, "winner": room.getWinner()})
+
+    def state(self, connection, message):
+        if connection.room is None:
+            raise ValueError("Not in a room")
+        reply = {"type": "state", "player": connection.player}
+        reply.update(connection.room.getState())
+        connection.send(reply)
+
+    # takes the client out of its room, closing the room once it is empty
+    def leave(self, connection, message):
+        room = connection.room
+        if room is None:
+            return
+        room.connections.discard(connection)
+        if connection.player is not None:
+            del room.seats[connection.player]
+            room.broadcast({"type": "player_left", "player": connection.player})
+        connection.room = None
+        connection.player = None
+        if not room.connections:
+            del self.rooms[room.name]
+
+    # starts listening on a Unix socket at path if given, otherwise on host and port, and
+    # returns the asyncio server
+    async def start(self, host="127.0.0.1", port=8754, path=None):
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path, limit=MAX_LINE)
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+
+# a client for the server, for tests, bots and remote play
+class GameClient:
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host="127.0.0.1", port=8754, path=None):
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path,
+                limit=MAX_LINE)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port,
+                limit=MAX_LINE)
+
+    async def send(self, message_type, **fields):
+        fields["type"] = message_type
+        self.writer.write((json.dumps(fields, separators=(",", ":")) + "\n").encode())
+        await self.writer.drain()
+
+    # returns the next message from the server, or None once it disconnects. Raises
+    # ValueError for a line that is too long or is not a JSON object
+    async def receive(self):
+        line = await self.reader.readline()
+        if not line:
+            return None
+        message = json.loads(line.decode("utf-8"))
+        if not isinstance(message, dict):
+            raise ValueError("Invalid message")
+        return message
+
+    # joins a room and returns the server's reply, passing on messages that come before
+    # it to handle if given
+    async def join(self, room, dimensions=2, size=0, players=2, handle=None):
+        await self.send("join", room=room, dimensions=dimensions, size=size,
+            players=players)
+        while True:
+            message = await self.receive()
+            if message is None or message.get("type") in ("joined", "error"):
+                return message
+            if handle is not None:
+                handle(message)
+
+    async def move(self, coord):
+        await self.send("move", coord=list(coord))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+# a room joined from another thread, such as a user interface's. The connection runs on
+# an event loop in a background thread, so sendMove and getMessages never block: moves
+# are handed to the loop and everything the server sends waits in a queue
+class RemoteGame:
+    # connects and joins the room, waiting up to timeout seconds for the server's reply.
+    # Raises ValueError if the room cannot be joined
+    def __init__(self, room, dimensions=2, size=0, players=2, host="127.0.0.1",
+            port=8754, path=None, timeout=JOIN_TIMEOUT):
+        self.messages = queue.Queue()
+        self.client = GameClient()
+        self.loop = asyncio.new_event_loop()
+        self.joined = threading.Event()
+        self.state = None
+        # False once the server has disconnected, after which moves cannot be sent
+        self.connected = True
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(
+            self.communicate(room, dimensions, size, players, host, port, path, timeout),),
+            daemon=True)
+        self.thread.start()
+        self.joined.wait()
+        if self.state is None or self.state.get("type") != "joined":
+            self.thread.join()
+            self.loop.close()
+            message = "Disconnected"
+            if self.state is not None:
+                message = str(self.state.get("message", "Refused"))
+            raise ValueError("Could not join " + room + ": " + message)
+        # the player number of this client's seat, or None when spectating
+        self.player = self.state["player"]
+        self.dimensions = self.state["dimensions"]
+        self.size = self.state["size"]
+        self.players = self.state["players"]
+
+    # connects and joins the room, keeping the server's reply in state
+    async def connect(self, room, dimensions, size, players, host, port, path):
+        await self.client.connect(host, port, path)
+        self.state = await self.client.join(room, dimensions, size, players,
+            self.messages.put)
+
+    # joins the room, then queues messages until the server disconnects. The thread
+    # waiting in __init__ is released however joining ends
+    async def communicate(self, room, dimensions, size, players, host, port, path,
+            timeout):
+        try:
+            await asyncio.wait_for(self.connect(room, dimensions, size, players, host,
+                port, path), timeout)
+        except asyncio.TimeoutError:
+            self.state = {"type": "error", "message": "Timed out"}
+        except (OSError, ValueError) as e:
+            self.state = {"type": "error", "message": str(e)}
+        finally:
+            self.joined.set()
+        if self.state is None or self.state.get("type") != "joined":
+            await self.client.close()
+            return
+        self.messages.put(self.state)
+        while True:
+            try:
+                message = await self.client.receive()
+            except (OSError, ValueError):
+                message = None
+            if message is None:
+                self.connected = False
+                self.messages.put({"type": "disconnected"})
+                break
+            self.messages.put(message)
+        await self.client.close()
+
+    # hands a move to the connection's loop. Raises ValueError once disconnected, since
+    # the loop has stopped and the move would never be sent
+    def sendMove(self, coord):
+        if not self.connected or not self.loop.is_running():
+            raise ValueError("Disconnected")
+        asyncio.run_coroutine_threadsafe(self.client.move(coord), self.loop)
+
+    # returns the messages received since the last call, oldest first
+    def getMessages(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        if self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self.client.close(), self.loop)
+            self.thread.join()
+        self.loop.close()
+
+async def serve(host, port, path):
+    server = await GameServer().start(host, port, path)
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host networked games.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("-p", "--port", type=int, default=8754, help="TCP port")
+    parser.add_argument("-u", "--unix", help="Unix socket path to listen on instead")
+    parser.add_argument("-j", "--join", metavar="ROOM",
+        help="play in a room on the server instead of hosting")
+    parser.add_argument("--dimensions", type=int, default=4,
+        help="dimensions of a room created by joining")
+    parser.add_argument("--size", type=int, default=0,
+        help="board size of a room created by joining")
+    parser.add_argument("--players", type=int, default=2,
+        help="players of a room created by joining")
+    args = parser.parse_args(argv)
+    if args.join is not None:
+        try:
+            remote = RemoteGame(args.join, args.dimensions, args.size, args.players,
+                args.host, args.port, args.unix)
+        except ValueError as e:
+            parser.exit(1, str(e) + "\n")
+        try:
+            CursesController(Model(remote.dimensions, remote.size, remote.players), remote)
+        finally:
+            remote.close()
+        return
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()